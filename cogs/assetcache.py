@@ -0,0 +1,198 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+import aiohttp
+from collections import OrderedDict
+
+
+class AssetCache:
+    """Caché compartida de recursos remotos (avatares, fondos, GIFs).
+
+    Memoria LRU limitada por bytes sobre una caché en disco direccionada por
+    contenido (sha256). Las entradas caducadas se revalidan con ETag/Last-Modified
+    y las descargas simultáneas de la misma URL comparten una sola petición.
+    """
+
+    def __init__(self, directory='data/assets', memory_bytes=32 * 1024 * 1024, max_age=3600,
+                 max_entries=5000, max_size=16 * 1024 * 1024):
+        self.directory = directory
+        self.memory_bytes = memory_bytes
+        self.max_age = max_age
+        self.max_entries = max_entries
+        self.max_size = max_size
+        self.index_file = os.path.join(directory, 'index.json')
+        self.index = self.load_index()   # url -> {digest, etag, last_modified, checked}
+        self.memory = OrderedDict()      # digest -> bytes
+        self.memory_used = 0
+        self.inflight = {}               # url -> tarea de descarga en curso
+        self.session = None
+        self.save_task = None
+
+    def load_index(self):
+        try:
+            with open(self.index_file, 'r') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def save_index(self):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp = self.index_file + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.index, f)
+        os.replace(tmp, self.index_file)
+
+    def _schedule_save(self):
+        # Agrupar los guardados de una ráfaga de descargas en una sola escritura
+        if self.save_task is None or self.save_task.done():
+            self.save_task = asyncio.create_task(self._delayed_save())
+
+    async def _delayed_save(self):
+        await asyncio.sleep(5)
+        await asyncio.to_thread(self.save_index)
+
+    async def close(self):
+        if self.save_task and not self.save_task.done():
+            self.save_task.cancel()
+            self.save_index()
+        if self.session:
+            await self.session.close()
+            self.session = None
+
+    def path_for(self, digest):
+        return os.path.join(self.directory, digest)
+
+    async def get(self, url):
+        """Contenido de una URL, desde memoria, disco o red"""
+        digest = await self._resolve(url)
+        data = self.memory.get(digest)
+        if data is not None:
+            self.memory.move_to_end(digest)
+            return data
+
+        data = await asyncio.to_thread(self._read, digest)
+        self._remember(digest, data)
+        return data
+
+    async def get_path(self, url):
+        """Ruta en disco del contenido de una URL (cambia si cambia el contenido)"""
+        return self.path_for(await self._resolve(url))
+
+    def _read(self, digest):
+        with open(self.path_for(digest), 'rb') as f:
+            return f.read()
+
+    def _remember(self, digest, data):
+        if len(data) > self.memory_bytes // 4:
+            return  # Recursos enormes solo en disco
+        if digest in self.memory:
+            self.memory.move_to_end(digest)
+            return
+        self.memory[digest] = data
+        self.memory_used += len(data)
+        while self.memory_used > self.memory_bytes:
+            _, evicted = self.memory.popitem(last=False)
+            self.memory_used -= len(evicted)
+
+    async def _resolve(self, url):
+        """Asegurar que la URL está en disco y fresca; devuelve su digest"""
+        entry = self.index.get(url)
+        if entry and time.time() - entry['checked'] < self.max_age and os.path.exists(self.path_for(entry['digest'])):
+            return entry['digest']
+
+        # 200 joins con el mismo fondo: una sola descarga
+        task = self.inflight.get(url)
+        if task is None:
+            task = self.inflight[url] = asyncio.create_task(self._fetch(url))
+            task.add_done_callback(lambda _: self.inflight.pop(url, None))
+        return await asyncio.shield(task)
+
+    async def _fetch(self, url):
+        entry = self.index.get(url)
+        if entry and not os.path.exists(self.path_for(entry['digest'])):
+            entry = None  # El archivo desapareció del disco: descarga completa
+
+        headers = {}
+        if entry:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+
+        if self.session is None:
+            self.session = aiohttp.ClientSession()
+
+        try:
+            async with self.session.get(url, headers=headers) as response:
+                if response.status == 304 and entry:
+                    entry['checked'] = time.time()
+                    self.index[url] = self.index.pop(url)  # Recién usada: la última en podarse
+                    self._schedule_save()
+                    return entry['digest']
+
+                response.raise_for_status()
+                if (response.content_length or 0) > self.max_size:
+                    raise ValueError(f"Recurso demasiado grande: {response.content_length} bytes")
+                # Sin Content-Length (o si miente) el límite se aplica mientras se lee
+                chunks = []
+                total = 0
+                async for chunk in response.content.iter_chunked(64 * 1024):
+                    total += len(chunk)
+                    if total > self.max_size:
+                        raise ValueError(f"Recurso demasiado grande: más de {self.max_size} bytes")
+                    chunks.append(chunk)
+                data = b''.join(chunks)
+                etag = response.headers.get('ETag')
+                last_modified = response.headers.get('Last-Modified')
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            if entry:
+                return entry['digest']  # Sin red: mejor una copia antigua que nada
+            raise
+
+        digest = hashlib.sha256(data).hexdigest()
+        if not os.path.exists(self.path_for(digest)):
+            await asyncio.to_thread(self._write, digest, data)
+        self._remember(digest, data)
+
+        self.index.pop(url, None)
+        self.index[url] = {'digest': digest, 'etag': etag, 'last_modified': last_modified, 'checked': time.time()}
+        if len(self.index) > self.max_entries:
+            await self._prune()
+        self._schedule_save()
+        return digest
+
+    def _write(self, digest, data):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp = self.path_for(digest) + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, self.path_for(digest))
+
+    async def _prune(self):
+        """Olvidar las URLs más antiguas y borrar los archivos que ya nadie referencia"""
+        # Se baja al 90% del límite para no recorrer el directorio en cada URL nueva (p. ej.
+        # un avatar por join durante un raid). El índice está en orden de inserción:
+        # las primeras son las más antiguas
+        target = int(self.max_entries * 0.9)
+        for url in list(self.index)[:len(self.index) - target]:
+            del self.index[url]
+        alive = {entry['digest'] for entry in self.index.values()}
+        await asyncio.to_thread(self._remove_unreferenced, alive)
+
+    def _remove_unreferenced(self, alive):
+        for name in os.listdir(self.directory):
+            if len(name) == 64 and name not in alive:
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+
+
+def get_asset_cache(bot):
+    """Caché de recursos compartida por todos los cogs del bot"""
+    cache = getattr(bot, 'asset_cache', None)
+    if cache is None:
+        cache = bot.asset_cache = AssetCache()
+    return cache
@@ -0,0 +1,129 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+import aiohttp
+from .ttlcache import TTLCache
+from .similarity import BKTree
+from .imaging import get_image_pool, dhash
+
+CHUNK_SIZE = 64 * 1024
+
+
+class AttachmentScanner:
+    """Compara adjuntos con un corpus local de hashes conocidos (SHA-256 y dHash de imágenes)"""
+
+    def __init__(self, known_bad_file, max_bytes, image_max_bytes, concurrency=4,
+                 phash_distance=4, verdict_ttl=3600, reload_interval=5):
+        self.known_bad_file = known_bad_file
+        self.max_bytes = max_bytes
+        self.image_max_bytes = image_max_bytes
+        self.phash_distance = phash_distance
+        self.reload_interval = reload_interval
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.verdicts = TTLCache(ttl=verdict_ttl, maxsize=20000)  # (url sin query, tamaño) -> motivo o None
+        self.session = None
+
+        self.sha256 = {}          # hash hexadecimal -> etiqueta
+        self.phashes = BKTree()   # dHash -> etiqueta
+        self.mtime = None
+        self.checked = 0
+
+    def reload(self):
+        """Recargar el corpus si el archivo cambió en disco (como mucho cada reload_interval s)"""
+        now = time.monotonic()
+        if now - self.checked < self.reload_interval:
+            return
+        self.checked = now
+
+        try:
+            mtime = os.stat(self.known_bad_file).st_mtime
+        except FileNotFoundError:
+            mtime = None
+        if mtime == self.mtime:
+            return
+
+        data = {}
+        if mtime is not None:
+            try:
+                with open(self.known_bad_file, 'r') as f:
+                    data = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                print(f"❌ Error cargando {self.known_bad_file}: {e}")
+                return  # Conservar el corpus anterior hasta que el archivo sea válido
+
+        self.sha256 = {digest.lower(): label for digest, label in data.get('sha256', {}).items()}
+        phashes = BKTree()
+        for value, label in data.get('phash', {}).items():
+            phashes.add(int(value, 16), label)
+        self.phashes = phashes
+        self.mtime = mtime
+        # Un corpus nuevo invalida los veredictos anteriores
+        self.verdicts.clear()
+        print(f"🛡️ Corpus de adjuntos cargado: {len(self.sha256)} SHA-256, {len(self.phashes)} dHash")
+
+    async def close(self):
+        if self.session:
+            await self.session.close()
+            self.session = None
+
+    async def scan(self, attachment):
+        """Motivo por el que un adjunto es malicioso, o None si no coincide con el corpus"""
+        self.reload()
+        if not self.sha256 and not len(self.phashes):
+            return None
+
+        # La URL del CDN lleva parámetros de firma que cambian: se ignoran
+        key = (attachment.url.split('?', 1)[0], attachment.size)
+        if key in self.verdicts:
+            return self.verdicts.get(key)
+
+        if attachment.size > self.max_bytes:
+            return None  # Demasiado grande para escanearlo
+
+        async with self.semaphore:
+            verdict = await self._scan(attachment)
+        self.verdicts.set(key, verdict)
+        return verdict
+
+    async def _scan(self, attachment):
+        is_image = (attachment.content_type or '').startswith('image/') and attachment.size <= self.image_max_bytes
+        loop = asyncio.get_running_loop()
+        hasher = hashlib.sha256()
+        image = bytearray() if is_image and len(self.phashes) else None
+        total = 0
+
+        if self.session is None:
+            self.session = aiohttp.ClientSession()
+
+        try:
+            async with self.session.get(attachment.url) as response:
+                response.raise_for_status()
+                async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                    total += len(chunk)
+                    if total > self.max_bytes:
+                        return None  # El tamaño declarado mentía: abortar la descarga
+                    # hashlib libera el GIL con bloques grandes: el hash va a un hilo
+                    await loop.run_in_executor(None, hasher.update, chunk)
+                    if image is not None:
+                        image.extend(chunk)
+        except aiohttp.ClientError as e:
+            print(f"⚠️ No se pudo descargar el adjunto {attachment.filename}: {e}")
+            return None
+
+        label = self.sha256.get(hasher.hexdigest())
+        if label:
+            return f"SHA-256 conocido ({label})"
+
+        if image:
+            try:
+                value = await loop.run_in_executor(get_image_pool(), dhash, bytes(image))
+            except Exception:
+                return None  # No era una imagen válida
+            matches = self.phashes.search(value, self.phash_distance)
+            if matches:
+                distance, label = min(matches, key=lambda match: match[0])
+                return f"Imagen conocida ({label}, distancia {distance})"
+
+        return None
@@ -3,6 +3,8 @@ from discord.ext import commands
 from discord import ui
 import config
 from datetime import datetime
+from .guildconfig import get_guild_config
+from .checks import get_config_role
 
 class AdminRolePanel(ui.View):
     def __init__(self, bot):
@@ -22,8 +24,8 @@ class AdminRolePanel(ui.View):
             await interaction.response.send_message("❌ Rol no encontrado.", ephemeral=True)
             return
         
-        # Actualizar configuración
-        config.ROLES["ADMIN"] = role.id
+        # Actualizar configuración (solo para este servidor)
+        get_guild_config(self.bot).set(interaction.guild.id, 'roles', 'ADMIN', role.id)
         
         embed = discord.Embed(
             title="✅ Rol ADMIN Actualizado",
@@ -58,8 +60,8 @@ class NormalRolePanel(ui.View):
             await interaction.response.send_message("❌ Rol no encontrado.", ephemeral=True)
             return
         
-        # Actualizar configuración
-        config.ROLES["NORMAL"] = role.id
+        # Actualizar configuración (solo para este servidor)
+        get_guild_config(self.bot).set(interaction.guild.id, 'roles', 'NORMAL', role.id)
         
         embed = discord.Embed(
             title="✅ Rol NORMAL Actualizado",
@@ -107,14 +109,13 @@ class RoleManagementView(ui.View):
             color=config.BOT_COLORS["primary"]
         )
         
-        if config.ROLES["ADMIN"]:
-            current_role = interaction.guild.get_role(config.ROLES["ADMIN"])
-            if current_role:
-                embed.add_field(
-                    name="🔄 Rol Actual",
-                    value=f"{current_role.mention} (ID: {current_role.id})",
-                    inline=False
-                )
+        current_role = get_config_role(interaction.guild, "ADMIN")
+        if current_role:
+            embed.add_field(
+                name="🔄 Rol Actual",
+                value=f"{current_role.mention} (ID: {current_role.id})",
+                inline=False
+            )
         
         view = AdminRolePanel(self.bot)
         view.children[0].options = role_options
@@ -147,14 +148,13 @@ class RoleManagementView(ui.View):
             color=config.BOT_COLORS["primary"]
         )
         
-        if config.ROLES["NORMAL"]:
-            current_role = interaction.guild.get_role(config.ROLES["NORMAL"])
-            if current_role:
-                embed.add_field(
-                    name="🔄 Rol Actual",
-                    value=f"{current_role.mention} (ID: {current_role.id})",
-                    inline=False
-                )
+        current_role = get_config_role(interaction.guild, "NORMAL")
+        if current_role:
+            embed.add_field(
+                name="🔄 Rol Actual",
+                value=f"{current_role.mention} (ID: {current_role.id})",
+                inline=False
+            )
         
         view = NormalRolePanel(self.bot)
         view.children[0].options = role_options
@@ -171,7 +171,7 @@ class RoleManagementView(ui.View):
         )
         
         # Rol ADMIN
-        admin_role = interaction.guild.get_role(config.ROLES["ADMIN"])
+        admin_role = get_config_role(interaction.guild, "ADMIN")
         if admin_role:
             embed.add_field(
                 name="👑 Rol ADMIN",
@@ -181,12 +181,12 @@ class RoleManagementView(ui.View):
         else:
             embed.add_field(
                 name="👑 Rol ADMIN",
-                value=f"❌ No configurado\n**ID en config:** {config.ROLES['ADMIN']}",
+                value=f"❌ No configurado\n**ID en config:** {get_guild_config(self.bot).role_id(interaction.guild.id, 'ADMIN')}",
                 inline=True
             )
         
         # Rol NORMAL
-        normal_role = interaction.guild.get_role(config.ROLES["NORMAL"])
+        normal_role = get_config_role(interaction.guild, "NORMAL")
         if normal_role:
             embed.add_field(
                 name="👥 Rol NORMAL",
@@ -196,13 +196,13 @@ class RoleManagementView(ui.View):
         else:
             embed.add_field(
                 name="👥 Rol NORMAL",
-                value=f"❌ No configurado\n**ID en config:** {config.ROLES['NORMAL']}",
+                value=f"❌ No configurado\n**ID en config:** {get_guild_config(self.bot).role_id(interaction.guild.id, 'NORMAL')}",
                 inline=True
             )
         
         embed.add_field(
             name="💡 Información",
-            value="Los cambios se aplican inmediatamente pero requieren reinicio del bot para persistir permanentemente.",
+            value="Los cambios se aplican inmediatamente y se guardan para este servidor.",
             inline=False
         )
         
@@ -211,11 +211,11 @@ class RoleManagementView(ui.View):
     @ui.button(label="🔄 Resetear a Default", style=discord.ButtonStyle.danger, emoji="🔄")
     async def reset_to_default(self, interaction: discord.Interaction, button: ui.Button):
         # Restablecer a los valores por defecto del config.py
-        original_admin = 1424194293408727182
-        original_normal = 1424194212064268410
-        
-        config.ROLES["ADMIN"] = original_admin
-        config.ROLES["NORMAL"] = original_normal
+        settings = get_guild_config(self.bot)
+        settings.delete(interaction.guild.id, 'roles', 'ADMIN')
+        settings.delete(interaction.guild.id, 'roles', 'NORMAL')
+        original_admin = config.ROLES["ADMIN"]
+        original_normal = config.ROLES["NORMAL"]
         
         embed = discord.Embed(
             title="🔄 Configuración Resetada",
@@ -258,8 +258,8 @@ class Authorization(commands.Cog):
         )
         
         # Mostrar configuración actual
-        admin_role = ctx.guild.get_role(config.ROLES["ADMIN"])
-        normal_role = ctx.guild.get_role(config.ROLES["NORMAL"])
+        admin_role = get_config_role(ctx.guild, "ADMIN")
+        normal_role = get_config_role(ctx.guild, "NORMAL")
         
         if admin_role:
             embed.add_field(
@@ -287,7 +287,7 @@ class Authorization(commands.Cog):
                 inline=True
             )
         
-        embed.set_footer(text="Los cambios se aplican inmediatamente en esta sesión")
+        embed.set_footer(text="Los cambios se aplican inmediatamente y se guardan para este servidor")
         
         view = RoleManagementView(self.bot)
         await ctx.send(embed=embed, view=view, ephemeral=True)
@@ -304,7 +304,7 @@ class Authorization(commands.Cog):
         )
         
         # Verificar rol ADMIN
-        admin_role = ctx.guild.get_role(config.ROLES["ADMIN"])
+        admin_role = get_config_role(ctx.guild, "ADMIN")
         if admin_role:
             embed.add_field(
                 name="✅ Rol ADMIN",
@@ -314,12 +314,12 @@ class Authorization(commands.Cog):
         else:
             embed.add_field(
                 name="❌ Rol ADMIN",
-                value=f"**ID en config:** {config.ROLES['ADMIN']}\n**Estado:** No encontrado en el servidor",
+                value=f"**ID en config:** {get_guild_config(self.bot).role_id(ctx.guild.id, 'ADMIN')}\n**Estado:** No encontrado en el servidor",
                 inline=False
             )
         
         # Verificar rol NORMAL
-        normal_role = ctx.guild.get_role(config.ROLES["NORMAL"])
+        normal_role = get_config_role(ctx.guild, "NORMAL")
         if normal_role:
             embed.add_field(
                 name="✅ Rol NORMAL",
@@ -329,7 +329,7 @@ class Authorization(commands.Cog):
         else:
             embed.add_field(
                 name="❌ Rol NORMAL",
-                value=f"**ID en config:** {config.ROLES['NORMAL']}\n**Estado:** No encontrado en el servidor",
+                value=f"**ID en config:** {get_guild_config(self.bot).role_id(ctx.guild.id, 'NORMAL')}\n**Estado:** No encontrado en el servidor",
                 inline=False
             )
         
@@ -1,12 +1,16 @@
 import discord
 from discord.ext import commands
-import config
+from .guildconfig import role_id
+
+def get_config_role(guild, name):
+    """Rol ADMIN/NORMAL configurado para el servidor (o el de config.py por defecto)"""
+    return guild.get_role(role_id(guild.id, name))
 
 def has_normal_role():
     async def predicate(ctx):
         if ctx.author.guild_permissions.administrator:
             return True
-        normal_role = ctx.guild.get_role(config.ROLES["NORMAL"])
+        normal_role = get_config_role(ctx.guild, "NORMAL")
         if normal_role and normal_role in ctx.author.roles:
             return True
         await ctx.send("❌ No tienes el rol necesario para usar este comando.", ephemeral=True)
@@ -17,7 +21,7 @@ def has_admin_role():
     async def predicate(ctx):
         if ctx.author.guild_permissions.administrator:
             return True
-        admin_role = ctx.guild.get_role(config.ROLES["ADMIN"])
+        admin_role = get_config_role(ctx.guild, "ADMIN")
         if admin_role and admin_role in ctx.author.roles:
             return True
         await ctx.send("❌ No tienes permisos de administrador para usar este comando.", ephemeral=True)
@@ -1,7 +1,7 @@
 import discord
 from discord.ext import commands
 import config
-from .checks import has_admin_role
+from .checks import has_admin_role, get_config_role
 
 class Debug(commands.Cog):
     def __init__(self, bot):
@@ -59,8 +59,8 @@ class Debug(commands.Cog):
         )
         
         # Verificar roles configurados
-        normal_role = ctx.guild.get_role(config.ROLES['NORMAL'])
-        admin_role = ctx.guild.get_role(config.ROLES['ADMIN'])
+        normal_role = get_config_role(ctx.guild, "NORMAL")
+        admin_role = get_config_role(ctx.guild, "ADMIN")
         
         embed.add_field(
             name="Roles Configurados",
@@ -107,7 +107,7 @@ class Debug(commands.Cog):
                 await ctx.send("✅ Tengo permisos en la categoría")
             
             # 3. Verificar roles
-            admin_role = guild.get_role(config.ROLES["ADMIN"])
+            admin_role = get_config_role(guild, "ADMIN")
             if admin_role:
                 await ctx.send(f"✅ Rol admin encontrado: {admin_role.mention}")
             else:
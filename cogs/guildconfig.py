@@ -0,0 +1,240 @@
+import os
+import json
+import sqlite3
+import asyncio
+from types import MappingProxyType
+import config
+
+# Esquemas de cada sección: {clave: tipo} o un tipo único para secciones con claves libres
+SCHEMAS = {
+    'roles': {
+        'ADMIN': int,
+        'NORMAL': int,
+    },
+    'welcome': {
+        'channel_id': int,
+        'type': str,
+        'message': str,
+        'show_join_date': bool,
+        'show_account_age': bool,
+        'background_image': str,
+        'gif_url': str,
+    },
+    'reaction_roles': dict,  # message_id -> {emoji: {role_id, role_name, channel_id}}
+}
+
+# Archivos JSON anteriores que se importan la primera vez: sección -> ruta
+LEGACY_FILES = {
+    'welcome': 'data/welcome_config.json',
+    'reaction_roles': 'data/reaction_roles.json',
+}
+
+_EMPTY = MappingProxyType({})
+
+
+class ConfigError(ValueError):
+    """Sección, clave o tipo de valor no permitido por el esquema"""
+
+
+def validate(namespace, key, value):
+    """Comprobar una clave y su valor contra el esquema de la sección"""
+    schema = SCHEMAS.get(namespace)
+    if schema is None:
+        raise ConfigError(f"Sección desconocida: {namespace}")
+
+    expected = schema if isinstance(schema, type) else schema.get(key)
+    if expected is None:
+        raise ConfigError(f"Clave desconocida en {namespace}: {key}")
+    # bool es subclase de int: no aceptar True como ID de rol
+    if not isinstance(value, expected) or (expected is int and isinstance(value, bool)):
+        raise ConfigError(f"{namespace}.{key} debe ser {expected.__name__}, no {type(value).__name__}")
+
+
+class GuildConfigStore:
+    """Configuración por servidor en SQLite con caché en memoria y avisos de cambios.
+
+    Cada clave es una fila (guild_id, sección, clave, valor JSON), así que
+    actualizar un ajuste es escribir una sola fila. Las lecturas salen de la
+    caché (se carga el servidor entero la primera vez que se consulta) y
+    PRAGMA data_version detecta las ediciones hechas desde otro proceso.
+    """
+
+    def __init__(self, bot, path='data/guild_config.db', poll_interval=2.0):
+        self.bot = bot
+        self.path = path
+        self.poll_interval = poll_interval
+        self.cache = {}  # guild_id -> {sección: {clave: valor}}
+        self.watch_task = None
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.db = sqlite3.connect(path, isolation_level=None)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.execute(
+            'CREATE TABLE IF NOT EXISTS guild_settings ('
+            'guild_id INTEGER NOT NULL, namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, '
+            'PRIMARY KEY (guild_id, namespace, key))'
+        )
+        self.db.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)')
+        self.migrate_legacy_files()
+        self.data_version = self._data_version()
+
+    # LECTURA
+
+    def section(self, guild_id, namespace):
+        """Ajustes de una sección (solo lectura); un dict vacío si no hay nada guardado"""
+        guild = self.cache.get(guild_id)
+        if guild is None:
+            guild = self.cache[guild_id] = self._load_guild(guild_id)
+        values = guild.get(namespace)
+        return MappingProxyType(values) if values else _EMPTY
+
+    def get(self, guild_id, namespace, key, default=None):
+        return self.section(guild_id, namespace).get(key, default)
+
+    def role_id(self, guild_id, name):
+        """ID del rol ADMIN/NORMAL del servidor, o el de config.py si no se configuró"""
+        return self.get(guild_id, 'roles', name) or config.ROLES.get(name)
+
+    def guild_ids(self, namespace):
+        """Servidores que tienen algo guardado en una sección"""
+        rows = self.db.execute('SELECT DISTINCT guild_id FROM guild_settings WHERE namespace = ?', (namespace,))
+        return [guild_id for guild_id, in rows]
+
+    def _load_guild(self, guild_id):
+        guild = {}
+        rows = self.db.execute('SELECT namespace, key, value FROM guild_settings WHERE guild_id = ?', (guild_id,))
+        for namespace, key, value in rows:
+            guild.setdefault(namespace, {})[key] = json.loads(value)
+        return guild
+
+    # ESCRITURA
+
+    def set(self, guild_id, namespace, key, value):
+        """Guardar un ajuste (una fila) y avisar a los cogs"""
+        self.update(guild_id, namespace, {key: value})
+
+    def update(self, guild_id, namespace, values):
+        """Guardar varios ajustes de una sección en una sola transacción"""
+        for key, value in values.items():
+            validate(namespace, key, value)
+
+        rows = [(guild_id, namespace, str(key), json.dumps(value)) for key, value in values.items()]
+        self.db.execute('BEGIN')
+        self.db.executemany('INSERT OR REPLACE INTO guild_settings VALUES (?, ?, ?, ?)', rows)
+        self.db.execute('COMMIT')
+
+        for key, value in values.items():
+            self._apply(guild_id, namespace, str(key), value)
+
+    def delete(self, guild_id, namespace, key):
+        """Borrar un ajuste; vuelve a su valor por defecto"""
+        self.db.execute('DELETE FROM guild_settings WHERE guild_id = ? AND namespace = ? AND key = ?',
+                        (guild_id, namespace, str(key)))
+        self._apply(guild_id, namespace, str(key), None)
+
+    def _apply(self, guild_id, namespace, key, value):
+        guild = self.cache.get(guild_id)
+        if guild is not None:
+            if value is None:
+                values = guild.get(namespace, {})
+                values.pop(key, None)
+                if not values:
+                    guild.pop(namespace, None)
+            else:
+                guild.setdefault(namespace, {})[key] = value
+        self.bot.dispatch('guild_config_update', guild_id, namespace, key, value)
+
+    # CAMBIOS EXTERNOS
+
+    def _data_version(self):
+        # Solo cambia cuando otra conexión confirma una transacción
+        return self.db.execute('PRAGMA data_version').fetchone()[0]
+
+    def start(self):
+        if self.watch_task is None or self.watch_task.done():
+            self.watch_task = asyncio.create_task(self._watch())
+
+    def close(self):
+        if self.watch_task:
+            self.watch_task.cancel()
+        self.db.close()
+
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            version = self._data_version()
+            if version != self.data_version:
+                self.data_version = version
+                self.reload()
+
+    def reload(self):
+        """Releer de disco los servidores en caché y avisar de lo que cambió"""
+        for guild_id, old in list(self.cache.items()):
+            new = self._load_guild(guild_id)
+            self.cache[guild_id] = new
+            for namespace in old.keys() | new.keys():
+                before = old.get(namespace, {})
+                after = new.get(namespace, {})
+                for key in before.keys() | after.keys():
+                    if before.get(key) != after.get(key):
+                        self.bot.dispatch('guild_config_update', guild_id, namespace, key, after.get(key))
+        print("🔄 Configuración por servidor recargada (edición externa)")
+
+    # MIGRACIÓN
+
+    def migrate_legacy_files(self):
+        """Importar una sola vez los JSON de bienvenidas y reaction roles"""
+        if self.db.execute("SELECT 1 FROM meta WHERE key = 'legacy_migrated'").fetchone():
+            return
+
+        rows = []
+        for namespace, path in LEGACY_FILES.items():
+            try:
+                with open(path, 'r') as f:
+                    data = json.load(f)
+            except (FileNotFoundError, json.JSONDecodeError):
+                continue
+
+            for guild_id, values in data.items():
+                for key, value in values.items():
+                    try:
+                        validate(namespace, key, value)
+                    except ConfigError as e:
+                        print(f"⚠️ Ajuste omitido al migrar {path}: {e}")
+                        continue
+                    rows.append((int(guild_id), namespace, key, json.dumps(value)))
+
+        self.db.execute('BEGIN')
+        self.db.executemany('INSERT OR IGNORE INTO guild_settings VALUES (?, ?, ?, ?)', rows)
+        self.db.execute("INSERT INTO meta VALUES ('legacy_migrated', '1')")
+        self.db.execute('COMMIT')
+        if rows:
+            print(f"✅ Migrados {len(rows)} ajustes de JSON a {self.path}")
+
+
+_store = None
+
+
+def get_guild_config(bot):
+    """Almacén de configuración por servidor compartido por todos los cogs"""
+    global _store
+    if _store is None:
+        _store = GuildConfigStore(bot)
+        _store.start()
+    return _store
+
+
+def close_guild_config():
+    """Detener el vigilante y cerrar la base de datos al apagar el bot"""
+    global _store
+    if _store is not None:
+        _store.close()
+        _store = None
+
+
+def role_id(guild_id, name):
+    """ID del rol ADMIN/NORMAL de un servidor sin necesitar acceso al bot"""
+    if _store is None:
+        return config.ROLES.get(name)
+    return _store.role_id(guild_id, name)
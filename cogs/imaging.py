@@ -0,0 +1,218 @@
+import io
+import os
+import random
+import asyncio
+import secrets
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+
+# Sin caracteres ambiguos (0/O, 1/I/L)
+CAPTCHA_ALPHABET = 'ABCDEFGHJKMNPQRSTUVWXYZ23456789'
+
+_pool = None
+_fonts = {}  # Caché por proceso: (ruta, tamaño) -> fuente
+_card_templates = {}  # Caché por proceso: (ruta del fondo, mtime) -> plantilla de tarjeta
+
+# Tarjeta de bienvenida
+CARD_SIZE = (900, 300)
+CARD_AVATAR_SIZE = 200
+CARD_TEMPLATE_CACHE = 32
+
+
+def get_image_pool():
+    """Pool de procesos compartido para decodificar y renderizar imágenes fuera del event loop"""
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=2)
+    return _pool
+
+
+def close_image_pool():
+    """Cerrar el pool de procesos al apagar el bot"""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def dhash(data, size=8):
+    """Hash perceptual por diferencias (dHash) de size*size bits"""
+    with Image.open(io.BytesIO(data)) as image:
+        # En GIFs animados basta con el primer fotograma
+        gray = image.convert('L').resize((size + 1, size), Image.LANCZOS)
+    pixels = gray.tobytes()
+
+    value = 0
+    for row in range(size):
+        offset = row * (size + 1)
+        for col in range(size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def load_font(size, path='DejaVuSans-Bold.ttf'):
+    """Cargar una fuente TrueType una sola vez por proceso (o la integrada si no existe)"""
+    key = (path, size)
+    font = _fonts.get(key)
+    if font is None:
+        try:
+            font = ImageFont.truetype(path, size)
+        except OSError:
+            try:
+                font = ImageFont.load_default(size)
+            except TypeError:
+                font = ImageFont.load_default()  # Pillow < 10.1: fuente bitmap sin tamaño
+        _fonts[key] = font
+    return font
+
+
+def render_captcha(text, width=260, height=90):
+    """Renderizar un captcha PNG con caracteres girados, ruido y líneas"""
+    # Cada proceso del pool hereda el mismo estado de random: usar una semilla propia
+    rng = random.Random(os.urandom(8))
+    image = Image.new('RGB', (width, height), tuple(rng.randint(215, 255) for _ in range(3)))
+    draw = ImageDraw.Draw(image)
+
+    for _ in range(width * height // 25):
+        draw.point((rng.randrange(width), rng.randrange(height)),
+                   fill=tuple(rng.randint(120, 200) for _ in range(3)))
+
+    font = load_font(46)
+    step = (width - 20) // len(text)
+    for i, char in enumerate(text):
+        glyph = Image.new('RGBA', (step + 20, height), (0, 0, 0, 0))
+        ImageDraw.Draw(glyph).text((10, 12), char, font=font,
+                                   fill=tuple(rng.randint(10, 110) for _ in range(3)))
+        glyph = glyph.rotate(rng.uniform(-28, 28), resample=Image.BICUBIC)
+        image.paste(glyph, (10 + i * step + rng.randint(-4, 4), rng.randint(-8, 8)), glyph)
+
+    for _ in range(4):
+        points = [(rng.randrange(width), rng.randrange(height)) for _ in range(3)]
+        draw.line(points, fill=tuple(rng.randint(40, 140) for _ in range(3)), width=2)
+
+    image = image.filter(ImageFilter.SMOOTH)
+    buffer = io.BytesIO()
+    image.save(buffer, format='PNG', optimize=False)
+    return buffer.getvalue()
+
+
+def _fit_text(draw, text, font, max_width):
+    """Recortar un texto con '…' hasta que quepa en max_width píxeles"""
+    if draw.textlength(text, font=font) <= max_width:
+        return text
+    while text and draw.textlength(text + '…', font=font) > max_width:
+        text = text[:-1]
+    return text + '…'
+
+
+def load_card_template(background_path=None):
+    """Fondo decodificado y recortado, máscara del avatar y fuentes de una plantilla.
+
+    Se prepara una sola vez por proceso y por archivo: cambiar el fondo en disco
+    cambia su mtime y genera una plantilla nueva.
+    """
+    mtime = os.stat(background_path).st_mtime if background_path else None
+    key = (background_path, mtime)
+    template = _card_templates.get(key)
+    if template is not None:
+        return template
+
+    width, height = CARD_SIZE
+    if background_path:
+        with Image.open(background_path) as source:
+            background = source.convert('RGB')
+        # Recorte tipo "cover": escalar hasta cubrir la tarjeta y centrar
+        scale = max(width / background.width, height / background.height)
+        background = background.resize((max(width, round(background.width * scale)),
+                                        max(height, round(background.height * scale))), Image.LANCZOS)
+        left = (background.width - width) // 2
+        top = (background.height - height) // 2
+        background = background.crop((left, top, left + width, top + height))
+    else:
+        # Degradado morado con los colores del bot
+        gradient = Image.linear_gradient('L').rotate(90).resize((width, height))
+        background = Image.composite(Image.new('RGB', (width, height), (106, 13, 173)),
+                                     Image.new('RGB', (width, height), (30, 10, 50)), gradient)
+
+    # Oscurecer para que el texto se lea sobre cualquier fondo
+    background = Image.blend(background, Image.new('RGB', (width, height), (0, 0, 0)), 0.35)
+
+    # Máscara circular con supermuestreo para bordes suaves
+    big = CARD_AVATAR_SIZE * 4
+    mask = Image.new('L', (big, big), 0)
+    ImageDraw.Draw(mask).ellipse((0, 0, big - 1, big - 1), fill=255)
+    mask = mask.resize((CARD_AVATAR_SIZE, CARD_AVATAR_SIZE), Image.LANCZOS)
+
+    template = (background, mask, load_font(44), load_font(30), load_font(22, 'DejaVuSans.ttf'))
+    if len(_card_templates) >= CARD_TEMPLATE_CACHE:
+        _card_templates.pop(next(iter(_card_templates)))
+    _card_templates[key] = template
+    return template
+
+
+def render_welcome_card(background_path, avatar, title, name, footer):
+    """Componer la tarjeta de bienvenida PNG (fondo, avatar circular, nombre y contador)"""
+    background, mask, title_font, name_font, footer_font = load_card_template(background_path)
+    card = background.copy()
+    draw = ImageDraw.Draw(card)
+    width, height = CARD_SIZE
+
+    x = y = (height - CARD_AVATAR_SIZE) // 2
+    if avatar:
+        with Image.open(io.BytesIO(avatar)) as source:
+            picture = source.convert('RGB').resize((CARD_AVATAR_SIZE, CARD_AVATAR_SIZE), Image.LANCZOS)
+        draw.ellipse((x - 5, y - 5, x + CARD_AVATAR_SIZE + 4, y + CARD_AVATAR_SIZE + 4), fill=(255, 255, 255))
+        card.paste(picture, (x, y), mask)
+
+    text_x = x + CARD_AVATAR_SIZE + 40
+    max_width = width - text_x - 30
+    draw.text((text_x, 70), _fit_text(draw, title, title_font, max_width), font=title_font, fill=(255, 255, 255))
+    draw.text((text_x, 135), _fit_text(draw, name, name_font, max_width), font=name_font, fill=(230, 210, 255))
+    draw.text((text_x, 190), _fit_text(draw, footer, footer_font, max_width), font=footer_font, fill=(200, 200, 200))
+
+    buffer = io.BytesIO()
+    card.save(buffer, format='PNG', compress_level=1)
+    return buffer.getvalue()
+
+
+class CaptchaPool:
+    """Reserva de captchas pre-renderizados que se rellena en segundo plano"""
+
+    def __init__(self, size, length=6):
+        self.queue = asyncio.Queue(maxsize=size)
+        self.length = length
+        self.tasks = []
+
+    def start(self, workers=2):
+        if not self.tasks:
+            self.tasks = [asyncio.create_task(self._refill()) for _ in range(workers)]
+
+    def close(self):
+        for task in self.tasks:
+            task.cancel()
+        self.tasks = []
+
+    async def render(self):
+        """Generar un captcha nuevo fuera del event loop: devuelve (respuesta, png)"""
+        text = ''.join(secrets.choice(CAPTCHA_ALPHABET) for _ in range(self.length))
+        data = await asyncio.get_running_loop().run_in_executor(get_image_pool(), render_captcha, text)
+        return text, data
+
+    async def get(self):
+        """Sacar un captcha listo; si la reserva está vacía se renderiza uno al momento"""
+        try:
+            return self.queue.get_nowait()
+        except asyncio.QueueEmpty:
+            return await self.render()
+
+    async def _refill(self):
+        while True:
+            try:
+                item = await self.render()
+            except Exception as e:
+                # Un fallo no debe matar el relleno en silencio: get() seguirá renderizando al momento
+                print(f"❌ Error pre-renderizando captchas: {e}")
+                await asyncio.sleep(30)
+                continue
+            # put() espera mientras la reserva está llena
+            await self.queue.put(item)
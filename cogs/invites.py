@@ -0,0 +1,185 @@
+import discord
+import asyncio
+import re
+import time
+from .ttlcache import TTLCache
+from .ratelimit import BoundedExecutor
+
+# discord.gg/código, discord.com/invite/código y discordapp.com/invite/código
+INVITE_LINK_RE = re.compile(r'(?:https?://)?(?:www\.)?(?:discord\.gg|discord(?:app)?\.com/invite)/([a-zA-Z0-9-]{2,32})', re.I)
+
+
+def extract_invite_codes(content):
+    """Códigos de invitación distintos que aparecen en un texto, en orden"""
+    return list(dict.fromkeys(INVITE_LINK_RE.findall(content)))
+
+
+class InviteTracker:
+    """Caché de usos de invitaciones por servidor para atribuir cada join a un código"""
+
+    def __init__(self, bot, debounce=0.5):
+        self.bot = bot
+        self.debounce = debounce
+        self.uses = {}          # guild_id -> {código: [usos, max_usos, caduca (ts o None)]}, None si no hay permisos
+        self.exhausted = {}     # guild_id -> códigos que se agotaron (borrados tras su último uso)
+        self.pending = {}       # guild_id -> futures de joins esperando el siguiente refresco
+        self.refresh_tasks = {}
+        self.attributions = TTLCache(ttl=86400, maxsize=20000)  # (guild_id, member_id) -> código
+        self.executor = BoundedExecutor(concurrency=2)
+
+    @staticmethod
+    def _entry(invite):
+        expires = invite.expires_at.timestamp() if invite.expires_at else None
+        return [invite.uses or 0, invite.max_uses or 0, expires]
+
+    def codes(self, guild_id):
+        """Códigos de invitación conocidos del servidor"""
+        return set(self.uses.get(guild_id) or ())
+
+    async def fetch_uses(self, guild):
+        """Descargar todas las invitaciones del servidor (una petición)"""
+        invites = await guild.invites()
+        return {invite.code: self._entry(invite) for invite in invites}
+
+    async def load_guild(self, guild):
+        """Cargar la línea base de usos de un servidor"""
+        try:
+            self.uses[guild.id] = await self.fetch_uses(guild)
+        except discord.Forbidden:
+            self.uses[guild.id] = None  # Sin "Gestionar servidor": no se puede atribuir
+        except discord.HTTPException as e:
+            # Error pasajero: el servidor queda sin línea base y se reintenta en el próximo join
+            print(f"⚠️ No se pudieron cargar las invitaciones de {guild.name}: {e}")
+
+    async def load_all(self, guilds):
+        """Cargar las líneas base de varios servidores con concurrencia limitada"""
+        await self.executor.map(
+            (('invites', guild.id), lambda guild=guild: self.load_guild(guild))
+            for guild in guilds if guild.id not in self.uses
+        )
+
+    def on_invite_create(self, invite):
+        cache = self.uses.get(invite.guild.id)
+        if cache is not None:
+            cache[invite.code] = self._entry(invite)
+
+    def on_invite_delete(self, invite):
+        cache = self.uses.get(invite.guild.id)
+        if cache is not None:
+            entry = cache.pop(invite.code, None)
+            # Las invitaciones que agotan sus usos se borran solas: el último join fue suyo,
+            # salvo que attribute() ya se lo asignara (entonces los usos ya llegaron al máximo)
+            if entry and entry[1] and entry[0] + 1 == entry[1]:
+                self.exhausted.setdefault(invite.guild.id, []).append(invite.code)
+
+    async def attribute(self, member):
+        """Atribuir el join de un miembro a un código de invitación (o None si no se sabe)"""
+        guild = member.guild
+        if guild.id not in self.uses:
+            # Sin línea base todavía: este join no se puede atribuir
+            await self.load_guild(guild)
+            return None
+
+        cache = self.uses[guild.id]
+        if cache is None:
+            return None
+
+        now = time.time()
+        usable = [code for code, entry in cache.items()
+                  if (not entry[1] or entry[0] < entry[1])
+                  and (entry[2] is None or entry[2] > now)]
+
+        exhausted = self.exhausted.get(guild.id)
+        if exhausted:
+            # Una invitación acaba de agotarse: este join es el que la consumió
+            code = exhausted.pop(0)
+        elif len(usable) == 1 and not guild.vanity_url_code:
+            # Solo hay una invitación posible: no hace falta consultar la API
+            code = usable[0]
+            cache[code][0] += 1
+        else:
+            code = await self._attribute_by_diff(guild)
+
+        if code:
+            self.attributions.set((guild.id, member.id), code)
+        return code
+
+    async def _attribute_by_diff(self, guild):
+        """Esperar al siguiente refresco compartido y recibir el código que nos toque"""
+        waiter = asyncio.get_running_loop().create_future()
+        self.pending.setdefault(guild.id, []).append(waiter)
+
+        task = self.refresh_tasks.get(guild.id)
+        if task is None or task.done():
+            self.refresh_tasks[guild.id] = asyncio.create_task(self._refresh(guild))
+        return await waiter
+
+    async def _refresh(self, guild):
+        # Los joins que llegan casi a la vez comparten una única petición
+        while self.pending.get(guild.id):
+            await asyncio.sleep(self.debounce)
+            waiters = self.pending.pop(guild.id, [])
+
+            old = self.uses.get(guild.id) or {}
+            increments = []
+            try:
+                new = await self.fetch_uses(guild)
+            except discord.HTTPException:
+                new = None
+
+            if new is not None:
+                for code, entry in new.items():
+                    before = old[code][0] if code in old else 0
+                    increments.extend([code] * max(0, entry[0] - before))
+                self.uses[guild.id] = new
+
+            # Invitaciones que se agotaron (y borraron) durante la espera: ya no salen en la
+            # lista nueva, así que sus últimos usos son de estos joins y no del siguiente
+            exhausted = self.exhausted.get(guild.id) or []
+            unexplained = max(0, len(waiters) - len(increments))
+            increments.extend(exhausted[:unexplained])
+            del exhausted[:unexplained]
+
+            # Reparto por orden de llegada; lo que no se explica, a la URL personalizada
+            for i, waiter in enumerate(waiters):
+                if not waiter.done():
+                    waiter.set_result(increments[i] if i < len(increments) else guild.vanity_url_code)
+
+
+class InviteResolver:
+    """Resuelve códigos de invitación a su servidor con caché positiva, negativa y sin peticiones duplicadas"""
+
+    def __init__(self, bot, ttl=3600, negative_ttl=300):
+        self.bot = bot
+        self.resolved = TTLCache(ttl=ttl, maxsize=10000)          # código -> guild_id (0 si no es de un servidor)
+        self.invalid = TTLCache(ttl=negative_ttl, maxsize=10000)  # códigos inexistentes o caducados
+        self.inflight = {}                                        # código -> tarea de resolución en curso
+
+    async def resolve(self, code):
+        """ID del servidor al que lleva un código, o None si la invitación no existe"""
+        guild_id = self.resolved.get(code)
+        if guild_id is not None:
+            return guild_id
+        if code in self.invalid:
+            return None
+
+        # Si el mismo código llega cien veces a la vez, solo la primera consulta la API
+        task = self.inflight.get(code)
+        if task is None:
+            task = self.inflight[code] = asyncio.create_task(self._fetch(code))
+            task.add_done_callback(lambda _: self.inflight.pop(code, None))
+        return await asyncio.shield(task)
+
+    async def _fetch(self, code):
+        try:
+            invite = await self.bot.fetch_invite(code, with_counts=False, with_expiration=False)
+        except discord.NotFound:
+            self.invalid.set(code, True)
+            return None
+        except discord.HTTPException as e:
+            print(f"⚠️ No se pudo resolver la invitación {code}: {e}")
+            return None  # Error transitorio: no se cachea
+
+        guild_id = invite.guild.id if invite.guild else 0
+        self.resolved.set(code, guild_id)
+        return guild_id
@@ -0,0 +1,161 @@
+import discord
+import asyncio
+from collections import deque
+from .checks import get_config_role
+
+# Límites de Discord por mensaje
+MAX_EMBEDS_PER_MESSAGE = 10
+MAX_EMBED_CHARS_PER_MESSAGE = 6000
+
+
+class SecurityLogSink:
+    """Cola de logs de seguridad por servidor que agrupa hasta 10 embeds por mensaje"""
+
+    def __init__(self, bot, channel_name, interval=1.0, use_webhook=True, max_queue=500):
+        self.bot = bot
+        self.channel_name = channel_name
+        self.interval = interval
+        self.use_webhook = use_webhook
+        self.max_queue = max_queue
+        self.channel_ids = {}   # guild_id -> id del canal de logs
+        self.webhooks = {}      # channel_id -> webhook propio del bot (None si no se puede usar)
+        self.queues = {}        # guild_id -> deque de embeds pendientes
+        self.dropped = {}       # guild_id -> embeds descartados por cola llena
+        self.tasks = {}
+        self.locks = {}
+
+    async def get_channel(self, guild):
+        """Obtener (desde caché) o crear el canal de logs del servidor"""
+        channel_id = self.channel_ids.get(guild.id)
+        if channel_id:
+            channel = guild.get_channel(channel_id)
+            if channel:
+                return channel
+
+        # Evitar crear canales duplicados si llegan varios incidentes a la vez
+        lock = self.locks.setdefault(guild.id, asyncio.Lock())
+        async with lock:
+            channel = guild.get_channel(self.channel_ids.get(guild.id, 0))
+            if channel:
+                return channel
+
+            channel = discord.utils.get(guild.text_channels, name=self.channel_name)
+            if not channel:
+                overwrites = {
+                    guild.default_role: discord.PermissionOverwrite(read_messages=False),
+                    guild.me: discord.PermissionOverwrite(read_messages=True, send_messages=True)
+                }
+
+                # Agregar permisos para administradores
+                admin_role = get_config_role(guild, "ADMIN")
+                if admin_role:
+                    overwrites[admin_role] = discord.PermissionOverwrite(read_messages=True, send_messages=True)
+
+                channel = await guild.create_text_channel(
+                    self.channel_name,
+                    overwrites=overwrites,
+                    reason="Canal de logs de seguridad automático"
+                )
+
+            self.channel_ids[guild.id] = channel.id
+            return channel
+
+    def invalidate(self, channel_id):
+        """Olvidar un canal de logs (p. ej. porque fue eliminado)"""
+        for guild_id, cached_id in list(self.channel_ids.items()):
+            if cached_id == channel_id:
+                del self.channel_ids[guild_id]
+        self.webhooks.pop(channel_id, None)
+
+    def push(self, guild, embed):
+        """Encolar un embed; se enviará en el siguiente lote"""
+        queue = self.queues.get(guild.id)
+        if queue is None:
+            queue = self.queues[guild.id] = deque()
+
+        if len(queue) >= self.max_queue:
+            queue.popleft()
+            self.dropped[guild.id] = self.dropped.get(guild.id, 0) + 1
+        queue.append(embed)
+
+        task = self.tasks.get(guild.id)
+        if task is None or task.done():
+            self.tasks[guild.id] = asyncio.create_task(self._flush_loop(guild.id))
+
+    def close(self):
+        for task in self.tasks.values():
+            task.cancel()
+
+    def _take_batch(self, queue):
+        """Sacar de la cola tantos embeds como quepan en un mensaje"""
+        batch = []
+        chars = 0
+        while queue and len(batch) < MAX_EMBEDS_PER_MESSAGE:
+            size = len(queue[0])
+            if batch and chars + size > MAX_EMBED_CHARS_PER_MESSAGE:
+                break
+            batch.append(queue.popleft())
+            chars += size
+        return batch
+
+    async def _flush_loop(self, guild_id):
+        queue = self.queues[guild_id]
+        while queue:
+            # Esperar un poco para que se acumulen los incidentes de una ráfaga
+            await asyncio.sleep(self.interval)
+            guild = self.bot.get_guild(guild_id)
+            if not guild:
+                queue.clear()
+                break
+
+            dropped = self.dropped.pop(guild_id, 0)
+            if dropped:
+                queue.appendleft(discord.Embed(
+                    title="⚠️ Logs omitidos",
+                    description=f"Se descartaron {dropped} incidentes por saturación de la cola.",
+                    color=discord.Color.orange()
+                ))
+
+            batch = self._take_batch(queue)
+            try:
+                await self._deliver(guild, batch)
+            except discord.NotFound:
+                # El canal o el webhook ya no existen: se reintentará con uno nuevo
+                self.invalidate(self.channel_ids.get(guild_id, 0))
+                queue.extendleft(reversed(batch))
+            except discord.HTTPException as e:
+                print(f"❌ Error enviando logs de seguridad: {e}")
+
+    async def _deliver(self, guild, embeds):
+        channel = await self.get_channel(guild)
+
+        if self.use_webhook:
+            webhook = await self._get_webhook(channel)
+            if webhook:
+                # El webhook tiene su propia cubeta de rate limit, separada del canal
+                await webhook.send(
+                    embeds=embeds,
+                    username=self.bot.user.name,
+                    avatar_url=self.bot.user.display_avatar.url
+                )
+                return
+
+        await channel.send(embeds=embeds)
+
+    async def _get_webhook(self, channel):
+        if channel.id in self.webhooks:
+            return self.webhooks[channel.id]
+
+        try:
+            for existing in await channel.webhooks():
+                if existing.user == self.bot.user and existing.token:
+                    webhook = existing
+                    break
+            else:
+                webhook = await channel.create_webhook(name="Infinity RB Security", reason="Logs de seguridad")
+        except discord.Forbidden:
+            # Sin permiso de gestionar webhooks: usar el canal directamente
+            webhook = None
+
+        self.webhooks[channel.id] = webhook
+        return webhook
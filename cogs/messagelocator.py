@@ -0,0 +1,113 @@
+import re
+import asyncio
+import discord
+from .ttlcache import TTLCache
+
+# https://discord.com/channels/servidor/canal/mensaje (también ptb., canary. y discordapp.com)
+MESSAGE_LINK_RE = re.compile(r'https?://(?:(?:ptb|canary)\.)?discord(?:app)?\.com/channels/(?:\d+|@me)/(\d+)/(\d+)')
+# "canal-mensaje", el formato de Copiar ID con Shift pulsado
+CHANNEL_MESSAGE_RE = re.compile(r'^(\d{15,20})-(\d{15,20})$')
+
+
+def parse_message_reference(text):
+    """(channel_id o None, message_id) a partir de un enlace, 'canal-mensaje' o un ID suelto"""
+    text = text.strip().strip('<>')
+    match = MESSAGE_LINK_RE.search(text) or CHANNEL_MESSAGE_RE.match(text)
+    if match:
+        return int(match.group(1)), int(match.group(2))
+    if text.isdigit():
+        return None, int(text)
+    raise ValueError(f"Referencia de mensaje no válida: {text}")
+
+
+class MessageLocator:
+    """Encuentra un mensaje de un servidor sabiendo solo su ID.
+
+    Por orden: canal del enlace o de la pista, caché mensaje -> canal (alimentada
+    por los mensajes y reacciones que ve el bot), caché de mensajes de discord.py
+    y, como último recurso, sondeo concurrente de los canales que pueden contenerlo,
+    empezando por los de actividad más reciente.
+    """
+
+    def __init__(self, bot, cache_size=20000, ttl=7 * 86400, concurrency=5):
+        self.bot = bot
+        self.channels = TTLCache(ttl=ttl, maxsize=cache_size, lru=True)  # message_id -> channel_id
+        self.concurrency = concurrency
+
+    def remember(self, message_id, channel_id):
+        self.channels.set(message_id, channel_id)
+
+    async def locate(self, guild, reference, channel_hint=None):
+        """Mensaje de `guild` al que apunta `reference`, o None si no existe o no es visible"""
+        channel_id, message_id = parse_message_reference(reference)
+
+        # 1. El enlace o la pista dicen dónde está: una sola petición
+        for candidate_id in (channel_id, channel_hint.id if channel_hint else None, self.channels.get(message_id)):
+            if candidate_id is None:
+                continue
+            channel = guild.get_channel_or_thread(candidate_id)
+            if channel is not None:
+                message = await self._fetch(channel, message_id)
+                if message:
+                    return message
+
+        # 2. Ya en la caché de discord.py: ninguna petición
+        message = discord.utils.get(self.bot.cached_messages, id=message_id)
+        if message and message.guild == guild:
+            self.remember(message.id, message.channel.id)
+            return message
+
+        # 3. Sondear los canales posibles con concurrencia limitada
+        return await self._probe(guild, message_id)
+
+    async def _fetch(self, channel, message_id):
+        try:
+            message = await channel.fetch_message(message_id)
+        except (discord.NotFound, discord.Forbidden):
+            return None
+        except discord.HTTPException as e:
+            print(f"⚠️ Error buscando el mensaje {message_id} en #{channel}: {e}")
+            return None
+        self.remember(message.id, channel.id)
+        return message
+
+    def candidate_channels(self, guild, message_id):
+        """Canales que pueden contener el mensaje, los más activos primero"""
+        me = guild.me
+        candidates = []
+        for channel in [*guild.text_channels, *guild.voice_channels, *guild.threads]:
+            # Un canal creado después del mensaje, o cuyo último mensaje es anterior, no puede tenerlo
+            if channel.id > message_id:
+                continue
+            if channel.last_message_id is not None and channel.last_message_id < message_id:
+                continue
+            permissions = channel.permissions_for(me)
+            if not (permissions.view_channel and permissions.read_message_history):
+                continue
+            candidates.append(channel)
+
+        candidates.sort(key=lambda channel: channel.last_message_id or 0, reverse=True)
+        return candidates
+
+    async def _probe(self, guild, message_id):
+        candidates = self.candidate_channels(guild, message_id)
+        if not candidates:
+            return None
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def probe(channel):
+            async with semaphore:
+                return await self._fetch(channel, message_id)
+
+        # Las tareas arrancan en orden, así que los canales más activos se prueban antes
+        tasks = [asyncio.create_task(probe(channel)) for channel in candidates]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                message = await finished
+                if message:
+                    return message
+            return None
+        finally:
+            for task in tasks:
+                task.cancel()
@@ -0,0 +1,89 @@
+import asyncio
+import time
+
+# Límite global de Discord: 50 peticiones/segundo por bot. Dejamos margen
+# para el resto de cogs que siguen usando la API mientras tanto.
+GLOBAL_RATE = 40
+
+
+class TokenBucket:
+    """Cubeta de tokens: `rate` operaciones cada `per` segundos, con ráfagas de hasta `capacity`"""
+
+    def __init__(self, rate, per=1.0, capacity=None):
+        self.rate = rate / per
+        self.capacity = capacity if capacity is not None else rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    @property
+    def full(self):
+        self._refill()
+        return self.tokens >= self.capacity
+
+    def try_acquire(self, amount=1):
+        """Consumir tokens sin esperar; devuelve False si no hay suficientes"""
+        self._refill()
+        if self.tokens >= amount:
+            self.tokens -= amount
+            return True
+        return False
+
+    async def acquire(self, amount=1):
+        """Esperar hasta poder consumir `amount` tokens"""
+        async with self._lock:
+            while not self.try_acquire(amount):
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+
+class BoundedExecutor:
+    """Ejecuta llamadas a la API con concurrencia limitada, una cubeta por ruta y una global"""
+
+    def __init__(self, concurrency=8, route_rate=5, route_per=5.0, global_rate=GLOBAL_RATE, max_routes=1024):
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.global_bucket = TokenBucket(global_rate)
+        self.route_rate = route_rate
+        self.route_per = route_per
+        self.max_routes = max_routes
+        self.routes = {}
+
+    def _route_bucket(self, route):
+        bucket = self.routes.get(route)
+        if bucket is None:
+            if len(self.routes) >= self.max_routes:
+                # Las cubetas llenas no guardan información útil
+                self.routes = {key: b for key, b in self.routes.items() if not b.full}
+            bucket = self.routes[route] = TokenBucket(self.route_rate, self.route_per)
+        return bucket
+
+    async def submit(self, route, factory):
+        """Ejecutar `factory()` respetando la cubeta de `route`"""
+        # La espera por ruta va fuera del semáforo para no bloquear otras rutas
+        await self._route_bucket(route).acquire()
+        async with self.semaphore:
+            await self.global_bucket.acquire()
+            return await factory()
+
+    async def map(self, jobs, on_progress=None):
+        """Ejecutar una lista de (ruta, factory); devuelve resultados o excepciones en orden"""
+        jobs = list(jobs)
+        results = [None] * len(jobs)
+        done = 0
+
+        async def run(i, route, factory):
+            nonlocal done
+            try:
+                results[i] = await self.submit(route, factory)
+            except Exception as e:
+                results[i] = e
+            done += 1
+            if on_progress:
+                on_progress(done, len(jobs))
+
+        await asyncio.gather(*(run(i, route, factory) for i, (route, factory) in enumerate(jobs)))
+        return results
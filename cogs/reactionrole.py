@@ -1,32 +1,95 @@
 import discord
 from discord.ext import commands
-import json
-import os
+from discord import app_commands
+import asyncio
+import config
 from typing import Dict, List
+from .guildconfig import get_guild_config
+from .rolebatch import get_role_batcher
+from .messagelocator import MessageLocator
+
+def emoji_key(emoji):
+    """Clave estable de un emoji: el ID si es personalizado, el carácter si es unicode"""
+    if isinstance(emoji, str):
+        emoji = discord.PartialEmoji.from_str(emoji.strip())
+    if emoji.id:
+        return emoji.id
+    # ✅ y ✅️ (con selector de variación) son el mismo emoji
+    return emoji.name.replace('\ufe0f', '')
 
 class ReactionRole(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.reaction_roles_file = 'data/reaction_roles.json'
-        self.reaction_roles = self.load_reaction_roles()
+        self.settings = get_guild_config(bot)
+        self.role_batcher = get_role_batcher(bot)
+        self.locator = MessageLocator(bot)
+        self.reconcile_tasks = {}     # guild_id -> tarea de reconciliación en curso
+        self.reconcile_progress = {}  # guild_id -> contadores de la última reconciliación
+        self.startup_task = None
+        
+        # Índice compilado de todos los servidores
+        self.role_index = {}        # (message_id, emoji_key) -> role_id
+        self.indexed_messages = {}  # message_id -> claves de emoji; filtra las reacciones ajenas
+        self.build_index()
     
-    def load_reaction_roles(self):
-        """Carga los reaction roles desde el archivo JSON"""
-        try:
-            os.makedirs('data', exist_ok=True)
-            with open(self.reaction_roles_file, 'r') as f:
-                return json.load(f)
-        except FileNotFoundError:
-            return {}
+    def get_reaction_roles(self, guild_id):
+        """Reaction roles del servidor: message_id -> {emoji: datos del rol}"""
+        return self.settings.section(guild_id, 'reaction_roles')
+    
+    async def cog_load(self):
+        if config.REACTION_ROLE_RECONCILE_ON_STARTUP:
+            self.startup_task = asyncio.create_task(self.reconcile_on_startup())
+    
+    def cog_unload(self):
+        if self.startup_task:
+            self.startup_task.cancel()
+        for task in self.reconcile_tasks.values():
+            task.cancel()
+    
+    def build_index(self):
+        """Compilar el índice de reaction roles de todos los servidores"""
+        self.role_index.clear()
+        self.indexed_messages.clear()
+        for guild_id in self.settings.guild_ids('reaction_roles'):
+            for message_id, reactions in self.get_reaction_roles(guild_id).items():
+                self.index_message(int(message_id), reactions)
+        print(f"🎭 Índice de reaction roles: {len(self.role_index)} en {len(self.indexed_messages)} mensajes")
+    
+    def index_message(self, message_id, reactions):
+        """Sustituir las entradas de un mensaje en el índice (None o vacío lo quita)"""
+        for key in self.indexed_messages.pop(message_id, ()):
+            self.role_index.pop((message_id, key), None)
+        
+        if not reactions:
+            return
+        keys = []
+        for emoji, data in reactions.items():
+            key = emoji_key(emoji)
+            self.role_index[(message_id, key)] = data['role_id']
+            keys.append(key)
+        self.indexed_messages[message_id] = tuple(keys)
+    
+    @commands.Cog.listener()
+    async def on_guild_config_update(self, guild_id, namespace, key, value):
+        """Mantener el índice al día cuando cambia un mensaje de reaction roles"""
+        if namespace == 'reaction_roles':
+            self.index_message(int(key), value)
     
-    def save_reaction_roles(self):
-        """Guarda los reaction roles en el archivo JSON"""
-        with open(self.reaction_roles_file, 'w') as f:
-            json.dump(self.reaction_roles, f, indent=4)
+    @commands.Cog.listener()
+    async def on_message(self, message):
+        """Recordar en qué canal está cada mensaje para reactionrole_add"""
+        if message.guild:
+            self.locator.remember(message.id, message.channel.id)
     
     @commands.Cog.listener()
     async def on_raw_reaction_add(self, payload):
         """Evento cuando se agrega una reacción"""
+        if payload.guild_id:
+            self.locator.remember(payload.message_id, payload.channel_id)
+        
+        if payload.message_id not in self.indexed_messages:
+            return
+        
         # Ignorar bots
         if payload.member and payload.member.bot:
             return
@@ -36,6 +99,9 @@ class ReactionRole(commands.Cog):
     @commands.Cog.listener()
     async def on_raw_reaction_remove(self, payload):
         """Evento cuando se remueve una reacción"""
+        if payload.message_id not in self.indexed_messages:
+            return
+        
         # Obtener el miembro ya que no viene en payload para remove
         guild = self.bot.get_guild(payload.guild_id)
         if not guild:
@@ -49,46 +115,136 @@ class ReactionRole(commands.Cog):
     
     async def handle_reaction(self, payload, action):
         """Maneja la lógica de agregar/remover roles"""
-        guild_id = str(payload.guild_id)
-        message_id = str(payload.message_id)
-        emoji = str(payload.emoji)
+        # Una sola búsqueda en el índice; los emojis sin rol se ignoran en silencio
+        role_id = self.role_index.get((payload.message_id, emoji_key(payload.emoji)))
+        if role_id is None:
+            return
         
-        print(f"🔍 Reacción {action}: {emoji} en mensaje {message_id}")
+        guild = self.bot.get_guild(payload.guild_id)
+        if not guild:
+            return
         
-        # Verificar si esta mensaje tiene reaction roles configurados
-        if (guild_id in self.reaction_roles and 
-            message_id in self.reaction_roles[guild_id] and
-            emoji in self.reaction_roles[guild_id][message_id]):
-            
-            guild = self.bot.get_guild(payload.guild_id)
+        member = guild.get_member(payload.user_id)
+        if not member:
+            return
+        
+        role = guild.get_role(role_id)
+        if not role:
+            print(f"❌ Rol con ID {role_id} no encontrado")
+            return
+        
+        # Varias reacciones seguidas del mismo miembro se aplican en una sola llamada
+        if action == "add":
+            self.role_batcher.add(member, role, reason="Reaction role")
+        else:
+            self.role_batcher.remove(member, role, reason="Reaction role")
+    
+    # RECONCILIACIÓN
+    
+    async def reconcile_on_startup(self):
+        """Aplicar las reacciones que cambiaron mientras el bot estaba apagado"""
+        await self.bot.wait_until_ready()
+        for guild_id in self.settings.guild_ids('reaction_roles'):
+            guild = self.bot.get_guild(guild_id)
             if not guild:
-                return
-            
-            member = guild.get_member(payload.user_id)
-            if not member:
-                return
-            
-            role_data = self.reaction_roles[guild_id][message_id][emoji]
-            role_id = role_data['role_id']
-            role = guild.get_role(role_id)
-            
-            if not role:
-                print(f"❌ Rol con ID {role_id} no encontrado")
-                return
-            
+                continue
             try:
-                if action == "add":
-                    await member.add_roles(role)
-                    print(f"✅ Rol {role.name} agregado a {member.display_name}")
-                else:
-                    await member.remove_roles(role)
-                    print(f"❌ Rol {role.name} removido de {member.display_name}")
-            except discord.Forbidden:
-                print("❌ No tengo permisos para gestionar roles")
+                await self.start_reconcile(guild)
             except Exception as e:
-                print(f"❌ Error gestionando rol: {e}")
-        else:
-            print(f"❌ No hay reaction role configurado para {emoji} en mensaje {message_id}")
+                print(f"❌ Error reconciliando reaction roles en {guild.name}: {e}")
+    
+    def start_reconcile(self, guild):
+        """Tarea de reconciliación del servidor (reutiliza la que esté en curso)"""
+        task = self.reconcile_tasks.get(guild.id)
+        if task is None or task.done():
+            task = self.reconcile_tasks[guild.id] = asyncio.create_task(self.reconcile_guild(guild))
+        return task
+    
+    async def reconcile_guild(self, guild):
+        """Comparar las reacciones de cada mensaje configurado con quién tiene cada rol.
+        
+        Las reacciones se recorren paginadas con reaction.users(); de cada una solo
+        se guardan los IDs de quienes tienen o van a tener el rol, así que la memoria
+        crece con el tamaño del rol y no con el número de reacciones.
+        """
+        reaction_roles = dict(self.get_reaction_roles(guild.id))
+        progress = self.reconcile_progress[guild.id] = {
+            'messages': 0, 'total': len(reaction_roles), 'users': 0, 'added': 0, 'removed': 0, 'errors': 0
+        }
+        
+        reacted = {}        # role_id -> miembros con el rol que tienen alguna de sus reacciones
+        unreadable = set()  # roles con algún mensaje ilegible: no se les quita a nadie
+        semaphore = asyncio.Semaphore(config.REACTION_ROLE_RECONCILE_CONCURRENCY)
+        
+        async def reconcile_message(message_id, reactions):
+            async with semaphore:
+                roles = {emoji_key(emoji): guild.get_role(data['role_id']) for emoji, data in reactions.items()}
+                roles = {key: role for key, role in roles.items() if role}
+                for role in roles.values():
+                    reacted.setdefault(role.id, set())
+                
+                message = await self.fetch_configured_message(guild, message_id, reactions)
+                if not message:
+                    unreadable.update(role.id for role in roles.values())
+                    progress['errors'] += 1
+                    return
+                
+                for reaction in message.reactions:
+                    role = roles.get(emoji_key(reaction.emoji))
+                    if role:
+                        await self.reconcile_reaction(guild, reaction, role, reacted[role.id], progress)
+                progress['messages'] += 1
+        
+        await asyncio.gather(*(reconcile_message(message_id, reactions)
+                               for message_id, reactions in reaction_roles.items()))
+        
+        if config.REACTION_ROLE_RECONCILE_REMOVE:
+            pending = []
+            for role_id, members in reacted.items():
+                role = guild.get_role(role_id)
+                if not role or role_id in unreadable:
+                    continue
+                for member in role.members:
+                    if member.id not in members and not member.bot:
+                        pending.append(self.role_batcher.remove(member, role, reason="Reconciliación de reaction roles"))
+                        progress['removed'] += 1
+                        if len(pending) >= 50:
+                            await asyncio.gather(*pending)
+                            pending.clear()
+            await asyncio.gather(*pending)
+        
+        print(f"🎭 Reaction roles reconciliados en {guild.name}: +{progress['added']} -{progress['removed']} "
+              f"({progress['users']} reacciones, {progress['messages']}/{progress['total']} mensajes)")
+        return progress
+    
+    async def fetch_configured_message(self, guild, message_id, reactions):
+        """Mensaje de un reaction role usando el canal guardado como pista"""
+        channel = guild.get_channel_or_thread(next(iter(reactions.values()))['channel_id'])
+        try:
+            return await self.locator.locate(guild, message_id, channel)
+        except ValueError:
+            return None
+    
+    async def reconcile_reaction(self, guild, reaction, role, reacted, progress):
+        """Dar el rol a quien tiene la reacción y anotar quién reaccionó (para no quitárselo después)"""
+        pending = []
+        # reaction.users() pide las reacciones de 100 en 100 a medida que se recorren
+        async for user in reaction.users(limit=None):
+            progress['users'] += 1
+            member = guild.get_member(user.id)
+            if not member or member.bot:
+                continue
+            # También los que reciben el rol ahora: al quitar, ya aparecerán en role.members
+            reacted.add(member.id)
+            if member.get_role(role.id):
+                continue
+            pending.append(self.role_batcher.add(member, role, reason="Reconciliación de reaction roles"))
+            progress['added'] += 1
+            # No acumular miles de cambios pendientes: esperar a que se apliquen por tandas
+            if len(pending) >= 50:
+                await asyncio.gather(*pending)
+                pending.clear()
+        await asyncio.gather(*pending)
     
     @commands.hybrid_command(name="reactionrole", description="Sistema de roles por reacción")
     @commands.has_permissions(administrator=True)
@@ -102,11 +258,12 @@ class ReactionRole(commands.Cog):
         embed.add_field(
             name="📋 Comandos disponibles:",
             value=(
-                "`/reactionrole add <message_id> <emoji> <role>` - Agregar reaction role\n"
+                "`/reactionrole add <message_id|enlace> <emoji> <role> [canal]` - Agregar reaction role\n"
                 "`/reactionrole remove <message_id> <emoji>` - Remover reaction role\n"
                 "`/reactionrole list` - Listar reaction roles activos\n"
                 "`/reactionrole create` - Crear mensaje embed para reaction roles\n"
-                "`/reactionrole create_channel <channel_id>` - Crear en canal específico"
+                "`/reactionrole create_channel <channel_id>` - Crear en canal específico\n"
+                "`/reactionrole sync` - Aplicar reacciones hechas con el bot apagado"
             ),
             inline=False
         )
@@ -119,30 +276,28 @@ class ReactionRole(commands.Cog):
             await ctx.send("❌ Necesitas permisos de administrador para usar este comando.", ephemeral=True)
     
     @commands.hybrid_command(name="reactionrole_add", description="Agregar un reaction role a un mensaje")
+    @app_commands.describe(
+        message_id="ID o enlace del mensaje",
+        canal="Canal del mensaje (opcional, acelera la búsqueda)"
+    )
     @commands.has_permissions(administrator=True)
-    async def add_reaction_role(self, ctx, message_id: str, emoji: str, role: discord.Role):
+    async def add_reaction_role(self, ctx, message_id: str, emoji: str, role: discord.Role, canal: discord.TextChannel = None):
         """Agrega un reaction role a un mensaje existente"""
         try:
-            # Convertir a string para el JSON
-            guild_id = str(ctx.guild.id)
-            message_id_str = str(message_id)
-            
-            # Buscar el mensaje en todos los canales del servidor
-            message = None
-            channel_found = None
-            
-            for channel in ctx.guild.text_channels:
-                try:
-                    message = await channel.fetch_message(int(message_id))
-                    channel_found = channel
-                    break
-                except (discord.NotFound, discord.Forbidden):
-                    continue
+            try:
+                message = await self.locator.locate(ctx.guild, message_id, canal)
+            except ValueError:
+                await ctx.send("❌ Indica el ID del mensaje o su enlace.", ephemeral=True)
+                return
             
             if not message:
                 await ctx.send("❌ No se encontró el mensaje con ese ID en ningún canal del servidor.", ephemeral=True)
                 return
             
+            # Los IDs de mensaje se guardan como texto
+            message_id_str = str(message.id)
+            channel_found = message.channel
+            
             # Verificar si el emoji es válido
             try:
                 await message.add_reaction(emoji)
@@ -150,27 +305,20 @@ class ReactionRole(commands.Cog):
                 await ctx.send("❌ Emoji inválido o no puedo reaccionar con él.", ephemeral=True)
                 return
             
-            # Inicializar estructura de datos si no existe
-            if guild_id not in self.reaction_roles:
-                self.reaction_roles[guild_id] = {}
-            
-            if message_id_str not in self.reaction_roles[guild_id]:
-                self.reaction_roles[guild_id][message_id_str] = {}
-            
-            # AGREGAR EL REACTION ROLE A LA CONFIGURACIÓN
-            self.reaction_roles[guild_id][message_id_str][emoji] = {
+            # AGREGAR EL REACTION ROLE A LA CONFIGURACIÓN (una fila por mensaje)
+            reactions = dict(self.get_reaction_roles(ctx.guild.id).get(message_id_str, {}))
+            reactions[emoji] = {
                 'role_id': role.id,
                 'role_name': role.name,
                 'channel_id': channel_found.id
             }
-            
-            self.save_reaction_roles()
+            self.settings.set(ctx.guild.id, 'reaction_roles', message_id_str, reactions)
             
             embed = discord.Embed(
                 title="✅ Reaction Role Agregado",
                 color=discord.Color.green()
             )
-            embed.add_field(name="📄 Mensaje ID", value=message_id, inline=True)
+            embed.add_field(name="📄 Mensaje ID", value=message_id_str, inline=True)
             embed.add_field(name="🎯 Emoji", value=emoji, inline=True)
             embed.add_field(name="🎭 Rol", value=role.mention, inline=True)
             embed.add_field(name="📺 Canal", value=channel_found.mention, inline=True)
@@ -185,22 +333,17 @@ class ReactionRole(commands.Cog):
     @commands.has_permissions(administrator=True)
     async def remove_reaction_role(self, ctx, message_id: str, emoji: str):
         """Remueve un reaction role de un mensaje"""
-        guild_id = str(ctx.guild.id)
         message_id_str = str(message_id)
+        reactions = dict(self.get_reaction_roles(ctx.guild.id).get(message_id_str, {}))
         
-        if (guild_id in self.reaction_roles and 
-            message_id_str in self.reaction_roles[guild_id] and
-            emoji in self.reaction_roles[guild_id][message_id_str]):
-            
-            role_data = self.reaction_roles[guild_id][message_id_str].pop(emoji)
+        if emoji in reactions:
+            role_data = reactions.pop(emoji)
             
             # Limpiar estructura si está vacía
-            if not self.reaction_roles[guild_id][message_id_str]:
-                self.reaction_roles[guild_id].pop(message_id_str)
-            if not self.reaction_roles[guild_id]:
-                self.reaction_roles.pop(guild_id)
-            
-            self.save_reaction_roles()
+            if reactions:
+                self.settings.set(ctx.guild.id, 'reaction_roles', message_id_str, reactions)
+            else:
+                self.settings.delete(ctx.guild.id, 'reaction_roles', message_id_str)
             
             embed = discord.Embed(
                 title="✅ Reaction Role Removido",
@@ -218,9 +361,9 @@ class ReactionRole(commands.Cog):
     @commands.has_permissions(administrator=True)
     async def list_reaction_roles(self, ctx):
         """Lista todos los reaction roles del servidor"""
-        guild_id = str(ctx.guild.id)
+        reaction_roles = self.get_reaction_roles(ctx.guild.id)
         
-        if guild_id not in self.reaction_roles or not self.reaction_roles[guild_id]:
+        if not reaction_roles:
             await ctx.send("📝 No hay reaction roles configurados en este servidor")
             return
         
@@ -229,7 +372,7 @@ class ReactionRole(commands.Cog):
             color=discord.Color.blue()
         )
         
-        for message_id, reactions in self.reaction_roles[guild_id].items():
+        for message_id, reactions in list(reaction_roles.items()):
             try:
                 # Intentar obtener información del mensaje
                 channel_id = list(reactions.values())[0]['channel_id']
@@ -281,6 +424,7 @@ class ReactionRole(commands.Cog):
         embed.set_footer(text="Configurado por: Infinity RB")
         
         message = await ctx.send(embed=embed)
+        self.locator.remember(message.id, ctx.channel.id)
         
         embed_info = discord.Embed(
             title="📋 Información para configurar",
@@ -338,6 +482,7 @@ class ReactionRole(commands.Cog):
             
             # Enviar el mensaje al canal especificado
             message = await target_channel.send(embed=embed)
+            self.locator.remember(message.id, target_channel.id)
             
             # Enviar información de configuración al usuario
             embed_info = discord.Embed(
@@ -370,16 +515,16 @@ class ReactionRole(commands.Cog):
     @commands.has_permissions(administrator=True)
     async def clean_reaction_roles(self, ctx):
         """Limpia los reaction roles de mensajes que ya no existen"""
-        guild_id = str(ctx.guild.id)
+        reaction_roles = self.get_reaction_roles(ctx.guild.id)
         
-        if guild_id not in self.reaction_roles or not self.reaction_roles[guild_id]:
+        if not reaction_roles:
             await ctx.send("📝 No hay reaction roles configurados en este servidor")
             return
         
         removed_count = 0
         messages_to_remove = []
         
-        for message_id, reactions in self.reaction_roles[guild_id].items():
+        for message_id, reactions in list(reaction_roles.items()):
             try:
                 # Buscar el canal del primer reaction role
                 channel_id = list(reactions.values())[0]['channel_id']
@@ -403,14 +548,7 @@ class ReactionRole(commands.Cog):
         
         # Eliminar los reaction roles de mensajes no encontrados
         for message_id in messages_to_remove:
-            if message_id in self.reaction_roles[guild_id]:
-                del self.reaction_roles[guild_id][message_id]
-        
-        # Eliminar el guild si está vacío
-        if not self.reaction_roles[guild_id]:
-            del self.reaction_roles[guild_id]
-        
-        self.save_reaction_roles()
+            self.settings.delete(ctx.guild.id, 'reaction_roles', message_id)
         
         embed = discord.Embed(
             title="🧹 Limpieza Completada",
@@ -418,18 +556,70 @@ class ReactionRole(commands.Cog):
         )
         embed.add_field(
             name="📊 Resultados:",
-            value=f"**Reaction roles eliminados:** {removed_count}\n**Reaction roles activos:** {len(self.reaction_roles.get(guild_id, {}))}",
+            value=f"**Reaction roles eliminados:** {removed_count}\n**Reaction roles activos:** {len(self.get_reaction_roles(ctx.guild.id))}",
             inline=False
         )
         
         await ctx.send(embed=embed)
     
+    @commands.hybrid_command(name="reactionrole_sync", description="Reconciliar los reaction roles con las reacciones actuales")
+    @commands.has_permissions(administrator=True)
+    async def sync_reaction_roles(self, ctx):
+        """Revisa todas las reacciones y corrige los roles que no coinciden"""
+        if not self.get_reaction_roles(ctx.guild.id):
+            await ctx.send("📝 No hay reaction roles configurados en este servidor")
+            return
+        
+        await ctx.defer()
+        task = self.start_reconcile(ctx.guild)
+        message = await ctx.send(embed=self.build_sync_embed(ctx.guild.id, done=False))
+        
+        # Actualizar el progreso cada pocos segundos hasta que termine
+        while not task.done():
+            try:
+                await asyncio.wait_for(asyncio.shield(task), timeout=5)
+            except asyncio.TimeoutError:
+                await message.edit(embed=self.build_sync_embed(ctx.guild.id, done=False))
+            except asyncio.CancelledError:
+                if not task.cancelled():
+                    raise  # Se canceló el comando, no la reconciliación
+                break
+            except Exception:
+                break
+        
+        if task.cancelled():
+            await message.edit(content="⚠️ Reconciliación cancelada (el módulo se recargó)", embed=None)
+            return
+        if task.exception():
+            await message.edit(content=f"❌ Error en la reconciliación: {task.exception()}", embed=None)
+            return
+        await message.edit(embed=self.build_sync_embed(ctx.guild.id, done=True))
+    
+    def build_sync_embed(self, guild_id, done):
+        progress = self.reconcile_progress.get(guild_id) or {'messages': 0, 'total': 0, 'users': 0, 'added': 0, 'removed': 0, 'errors': 0}
+        embed = discord.Embed(
+            title="✅ Reconciliación Completada" if done else "🔄 Reconciliando Reaction Roles...",
+            color=discord.Color.green() if done else discord.Color.blue()
+        )
+        embed.add_field(name="📄 Mensajes", value=f"{progress['messages']}/{progress['total']}", inline=True)
+        embed.add_field(name="👥 Reacciones revisadas", value=str(progress['users']), inline=True)
+        embed.add_field(name="➕ Roles dados", value=str(progress['added']), inline=True)
+        embed.add_field(
+            name="➖ Roles quitados",
+            value=str(progress['removed']) if config.REACTION_ROLE_RECONCILE_REMOVE else "Desactivado",
+            inline=True
+        )
+        if progress['errors']:
+            embed.add_field(name="⚠️ Mensajes no encontrados", value=str(progress['errors']), inline=True)
+        return embed
+    
     @add_reaction_role.error
     @remove_reaction_role.error
     @list_reaction_roles.error
     @create_reaction_role_message.error
     @create_reaction_role_channel.error
     @clean_reaction_roles.error
+    @sync_reaction_roles.error
     async def reaction_role_commands_error(self, ctx, error):
         """Manejo de errores para comandos de reaction roles"""
         if isinstance(error, commands.MissingPermissions):
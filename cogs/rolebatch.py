@@ -0,0 +1,130 @@
+import time
+import asyncio
+import discord
+import config
+from .ttlcache import TTLCache
+
+
+class PendingRoles:
+    """Cambios de rol acumulados de un miembro durante la ventana de espera"""
+
+    def __init__(self, member, deadline, max_deadline):
+        self.member = member
+        self.changes = {}       # role_id -> (rol, True para añadir / False para quitar); gana el último
+        self.reasons = []
+        self.futures = []
+        self.deadline = deadline
+        self.max_deadline = max_deadline
+        self.task = None
+
+
+class RoleBatcher:
+    """Agrupa los cambios de rol de cada miembro y los aplica con un solo member.edit(roles=...).
+
+    Cada cambio retrasa la aplicación `delay` segundos (sin pasar de `max_delay`
+    desde el primero). Por cada rol solo cuenta la última petición, así que
+    añadir y quitar el mismo rol se anula; si el resultado coincide con los
+    roles actuales no se hace ninguna llamada.
+    """
+
+    def __init__(self, delay=1.0, max_delay=3.0):
+        self.delay = delay
+        self.max_delay = max_delay
+        self.pending = {}  # (guild_id, member_id) -> PendingRoles
+        # Último lote aplicado a cada miembro: (roles antes, roles después), hasta que el gateway nos alcance
+        self.applied = TTLCache(ttl=10, maxsize=10000)  # (guild_id, member_id) -> (frozenset, frozenset)
+
+    def add(self, member, *roles, reason=None):
+        """Programar roles para añadir; el futuro devuelto indica si se aplicó"""
+        return self._queue(member, roles, True, reason)
+
+    def remove(self, member, *roles, reason=None):
+        """Programar roles para quitar; el futuro devuelto indica si se aplicó"""
+        return self._queue(member, roles, False, reason)
+
+    def _queue(self, member, roles, add, reason):
+        key = (member.guild.id, member.id)
+        now = time.monotonic()
+        batch = self.pending.get(key)
+        if batch is None:
+            batch = self.pending[key] = PendingRoles(member, now + self.delay, now + self.max_delay)
+            batch.task = asyncio.create_task(self._wait_and_flush(key, batch))
+        else:
+            batch.member = member
+            batch.deadline = min(now + self.delay, batch.max_deadline)
+
+        for role in roles:
+            batch.changes[role.id] = (role, add)
+        if reason and reason not in batch.reasons:
+            batch.reasons.append(reason)
+
+        future = asyncio.get_running_loop().create_future()
+        batch.futures.append(future)
+        return future
+
+    async def _wait_and_flush(self, key, batch):
+        while (remaining := batch.deadline - time.monotonic()) > 0:
+            await asyncio.sleep(remaining)
+        await self._flush(key, batch)
+
+    async def _flush(self, key, batch):
+        if self.pending.get(key) is batch:
+            del self.pending[key]
+
+        # El miembro en caché refleja los roles actuales, no los de cuando se encoló...
+        member = batch.member.guild.get_member(batch.member.id) or batch.member
+        current = member.roles[1:]  # Sin @everyone
+        current_ids = {role.id for role in current}
+        # ...salvo que siga mostrando exactamente los roles de antes de nuestro lote anterior
+        # (su GUILD_MEMBER_UPDATE aún no llegó): partir de ella desharía ese lote. Cualquier
+        # otro cambio en la caché (manual, otro bot, anti-nuke) manda sobre lo que aplicamos.
+        last_applied = self.applied.pop(key)
+        if last_applied is not None and current_ids == last_applied[0]:
+            guild = member.guild
+            current = [role for role in map(guild.get_role, last_applied[1]) if role is not None]
+            current_ids = {role.id for role in current}
+
+        roles = [role for role in current if batch.changes.get(role.id, (None, True))[1]]
+        roles += [role for role, add in batch.changes.values() if add and role.id not in current_ids]
+
+        applied = True
+        if {role.id for role in roles} != current_ids:
+            try:
+                updated = await member.edit(roles=roles, reason='; '.join(batch.reasons) or None)
+                result = updated.roles[1:] if updated else roles
+                self.applied.set(key, (frozenset(current_ids), frozenset(role.id for role in result)))
+            except discord.Forbidden:
+                print(f"❌ Sin permisos para cambiar los roles de {member}")
+                applied = False
+            except discord.HTTPException as e:
+                print(f"❌ Error cambiando los roles de {member}: {e}")
+                applied = False
+
+        for future in batch.futures:
+            if not future.done():
+                future.set_result(applied)
+
+    def discard(self, member):
+        """Olvidar los cambios pendientes de un miembro (p. ej. antes de ponerlo en cuarentena)"""
+        self.applied.pop((member.guild.id, member.id))
+        batch = self.pending.pop((member.guild.id, member.id), None)
+        if batch is None:
+            return
+        batch.task.cancel()
+        for future in batch.futures:
+            if not future.done():
+                future.set_result(False)
+
+    async def close(self):
+        """Aplicar ya todo lo pendiente (al apagar el bot)"""
+        for key, batch in list(self.pending.items()):
+            batch.task.cancel()
+            await self._flush(key, batch)
+
+
+def get_role_batcher(bot):
+    """Agrupador de cambios de rol compartido por todos los cogs del bot"""
+    batcher = getattr(bot, 'role_batcher', None)
+    if batcher is None:
+        batcher = bot.role_batcher = RoleBatcher(config.ROLE_BATCH_DELAY, config.ROLE_BATCH_MAX_DELAY)
+    return batcher
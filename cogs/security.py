@@ -1,17 +1,242 @@
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
 import asyncio
 from datetime import datetime, timedelta, timezone
 import re
+import os
+import json
+import time
+import functools
+import io
+import csv
+import math
+from collections import Counter, OrderedDict, deque
+import numpy as np
 import config
+from .ratelimit import BoundedExecutor, TokenBucket
+from .ttlcache import TTLCache
+from .logsink import SecurityLogSink
+from .invites import InviteTracker, InviteResolver, extract_invite_codes
+from .similarity import (normalize_text, simhash, simhash_bands, hamming, SIMHASH_MAX_DISTANCE,
+                         normalize_name, name_minhash, minhash_bands, minhash_similarity,
+                         WindowedLSHIndex, WindowedBKTree)
+from .imaging import get_image_pool, dhash, CaptchaPool
+from .attachments import AttachmentScanner
+from .assetcache import get_asset_cache
+from .checks import get_config_role
+from .rolebatch import get_role_batcher
+
+# Señales del escaneo vectorizado, en el orden de Security.score_scan_features
+SCAN_SIGNALS = [
+    "Cuenta muy nueva",
+    "Sin avatar",
+    "Patrón de bot malicioso",
+    "Muchos números",
+    "Nombre genérico",
+    "Nombre aleatorio",
+    "Join en ráfaga",
+]
+
+
+class ScanResultsView(discord.ui.View):
+    """Lista paginada de cuentas sospechosas encontradas por /scan_members"""
+
+    def __init__(self, author_id, summary, rows, per_page=10):
+        super().__init__(timeout=600)
+        self.author_id = author_id
+        self.summary = summary
+        self.rows = rows
+        self.per_page = per_page
+        self.page = 0
+        self.pages = max(1, math.ceil(len(rows) / per_page))
+        self.update_buttons()
+
+    def update_buttons(self):
+        self.previous_page.disabled = self.page == 0
+        self.next_page.disabled = self.page >= self.pages - 1
+
+    def build_embeds(self):
+        start = self.page * self.per_page
+        lines = []
+        for row in self.rows[start:start + self.per_page]:
+            member = row['member']
+            lines.append(
+                f"**{row['score']}** · {member.mention} (`{member.id}`) · {row['age_days']} días\n"
+                f"└ {', '.join(row['reasons'])}"
+            )
+        
+        page = discord.Embed(
+            title="⚠️ Cuentas Sospechosas",
+            description="\n".join(lines),
+            color=discord.Color.orange()
+        )
+        page.set_footer(text=f"Página {self.page + 1}/{self.pages} • Ordenado por puntuación")
+        return [self.summary, page]
+
+    async def interaction_check(self, interaction: discord.Interaction):
+        if interaction.user.id != self.author_id:
+            await interaction.response.send_message("❌ Solo quien ejecutó el escaneo puede usar estos botones.", ephemeral=True)
+            return False
+        return True
+
+    @discord.ui.button(emoji="◀️", style=discord.ButtonStyle.secondary)
+    async def previous_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.page -= 1
+        self.update_buttons()
+        await interaction.response.edit_message(embeds=self.build_embeds(), view=self)
+
+    @discord.ui.button(emoji="▶️", style=discord.ButtonStyle.secondary)
+    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.page += 1
+        self.update_buttons()
+        await interaction.response.edit_message(embeds=self.build_embeds(), view=self)
+
+
+# Acciones disponibles en /raid_cleanup
+CLEANUP_ACTIONS = {
+    'kick': "Expulsar",
+    'ban': "Banear",
+    'timeout': "Aislar",
+}
+CLEANUP_CHUNK = 50  # Miembros procesados entre cada guardado de progreso
+
+
+class CleanupConfirmView(discord.ui.View):
+    """Confirmación antes de lanzar una limpieza masiva"""
+
+    def __init__(self, author_id):
+        super().__init__(timeout=120)
+        self.author_id = author_id
+        self.confirmed = False
+
+    async def interaction_check(self, interaction: discord.Interaction):
+        if interaction.user.id != self.author_id:
+            await interaction.response.send_message("❌ Solo quien lanzó la limpieza puede confirmarla.", ephemeral=True)
+            return False
+        return True
+
+    @discord.ui.button(label="Confirmar", style=discord.ButtonStyle.danger, emoji="🧹")
+    async def confirm(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.confirmed = True
+        await interaction.response.edit_message(view=None)
+        self.stop()
+
+    @discord.ui.button(label="Cancelar", style=discord.ButtonStyle.secondary, emoji="✖️")
+    async def cancel(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await interaction.response.edit_message(content="✖️ Limpieza cancelada.", embed=None, view=None)
+        self.stop()
+
+
+class VerificationPanelView(discord.ui.View):
+    """Panel persistente del canal de verificación"""
+
+    def __init__(self):
+        super().__init__(timeout=None)
+
+    @discord.ui.button(label="Verificarme", style=discord.ButtonStyle.success, emoji="✅", custom_id="security:captcha_start")
+    async def start(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await interaction.client.get_cog('Security').send_captcha(interaction)
+
+
+class CaptchaAnswerView(discord.ui.View):
+    """Botón que abre el formulario de respuesta del captcha"""
+
+    def __init__(self):
+        super().__init__(timeout=config.CAPTCHA_ANSWER_TTL)
+
+    @discord.ui.button(label="Responder", style=discord.ButtonStyle.primary, emoji="✏️")
+    async def answer(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await interaction.response.send_modal(CaptchaModal())
+
+
+class CaptchaModal(discord.ui.Modal, title='Verificación'):
+    answer = discord.ui.TextInput(
+        label='Texto de la imagen',
+        placeholder='Escribe los caracteres que ves...',
+        required=True,
+        max_length=12
+    )
+
+    async def on_submit(self, interaction: discord.Interaction):
+        await interaction.client.get_cog('Security').check_captcha(interaction, self.answer.value)
+
+
+class ChannelRate:
+    """Ritmo de mensajes de un canal (media móvil exponencial en mensajes/segundo)"""
+    __slots__ = ('rate', 'updated', 'level', 'changed', 'editing')
+
+    def __init__(self, now):
+        self.rate = 0.0
+        self.updated = now
+        self.changed = 0.0
+        self.editing = False
+        # Solo cuenta lo que aplicó el bot: un slowmode previo se considera puesto a mano
+        self.level = 0
+
+    def decay(self, now, tau):
+        self.rate *= math.exp(-(now - self.updated) / tau)
+        self.updated = now
+
+    def add_message(self, now, tau):
+        self.decay(now, tau)
+        self.rate += 1 / tau
+
+
+class NukeTracker:
+    """Ventanas deslizantes por (usuario, acción) con memoria acotada por servidor"""
+
+    def __init__(self, thresholds, max_actors):
+        self.thresholds = thresholds
+        self.max_actors = max_actors
+        self.windows = OrderedDict()  # (user_id, acción) -> deque de timestamps
+
+    def record(self, user_id, action, now):
+        """Registrar una acción; devuelve True si se supera el umbral configurado"""
+        limit, seconds = self.thresholds[action]
+        key = (user_id, action)
+        window = self.windows.get(key)
+        if window is None:
+            # Solo hacen falta los últimos `limit` eventos para saber si hay ráfaga
+            window = self.windows[key] = deque(maxlen=limit)
+            if len(self.windows) > self.max_actors:
+                self.windows.popitem(last=False)
+        else:
+            self.windows.move_to_end(key)
+        
+        window.append(now)
+        if len(window) == limit and now - window[0] <= seconds:
+            window.clear()
+            return True
+        return False
+
 
 class Security(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.join_times = []
-        self.raid_mode = False
         self.suspicious_joins = []
         
+        # Modo raid: snapshot de permisos originales por servidor (guild_id -> snapshot)
+        self.lockdown_file = 'data/lockdown_snapshots.json'
+        self.lockdown_snapshots = self.load_lockdown_snapshots()
+        self.raid_tasks = {}
+        self.lockdown_executor = BoundedExecutor(concurrency=10)
+        
+        # Entradas bot_add recientes recibidas por el gateway ((guild_id, bot_id) -> entrada)
+        self.bot_add_entries = TTLCache(ttl=120)
+        self.bot_add_waiters = {}
+        
+        # Detector anti-nuke por servidor (guild_id -> NukeTracker)
+        self.nuke_trackers = {}
+        
+        # Logs de seguridad agrupados (hasta 10 embeds por mensaje)
+        self.log_sink = SecurityLogSink(
+            bot,
+            config.SECURITY_LOG_CHANNEL,
+            interval=config.SECURITY_LOG_FLUSH_INTERVAL,
+            use_webhook=config.SECURITY_LOG_USE_WEBHOOK
+        )
+        
         # Patrones de nombres de bots maliciosos conocidos
         self.malicious_bot_patterns = [
             r'shappire', r'sapphire', r'shapire', r'shappire-bot', r'shappirebot',
@@ -34,8 +259,71 @@ class Security(commands.Cog):
             r'.*[0-9]{3,}.*[0-9]{3,}.*',  # Múltiples grupos de números
         ]
         
+        # Patrones de nombres genéricos (ver is_generic_name)
+        self.generic_patterns = [
+            r'^[a-z]+[0-9]+$',  # palabranúmeros
+            r'^[0-9]+[a-z]+$',  # númerospalabra
+            r'^[a-z]+\.[a-z]+$',  # palabra.palabra
+            r'^[a-z]+_[a-z]+$',  # palabra_palabra
+        ]
+        
+        # Versiones precompiladas en una sola alternancia para el escaneo masivo
+        self.malicious_name_re = re.compile('|'.join(self.malicious_bot_patterns))
+        self.number_name_re = re.compile('|'.join(self.number_patterns))
+        self.generic_name_re = re.compile('|'.join(f'(?:{p})' for p in self.generic_patterns))
+        
         # Usuarios verificados como seguros (staff, etc.)
         self.verified_users = set()
+        
+        # Huellas SimHash de mensajes recientes por servidor (guild_id -> índice LSH)
+        self.message_fingerprints = {}
+        self.flood_alerts = {}  # guild_id -> último aviso de flood registrado
+        
+        # Hashes perceptuales de avatares de joins recientes (guild_id -> WindowedBKTree)
+        self.avatar_hashes = {}
+        self.avatar_alerts = {}
+        
+        # Firmas MinHash de nombres de joins recientes (guild_id -> índice LSH)
+        self.name_signatures = {}
+        self.name_cluster_alerts = {}
+        self.name_cluster_members = TTLCache(ttl=86400, maxsize=10000)  # (guild_id, member_id) -> patrón
+        
+        # Perfiles completos consultados bajo demanda (user_id -> tiene banner)
+        self.profile_cache = TTLCache(ttl=3600, maxsize=5000, lru=True)
+        self.enrichment_budgets = {}  # guild_id -> TokenBucket
+        
+        # Atribución de joins a invitaciones (guild_id -> deque de (timestamp, código))
+        self.invite_tracker = InviteTracker(bot)
+        self.invite_joins = {}
+        self.invite_resolver = InviteResolver(bot, config.INVITE_CACHE_TTL, config.INVITE_NEGATIVE_TTL)
+        
+        # Limpiezas de raid en curso, persistidas para reanudarlas tras un reinicio
+        self.cleanup_file = 'data/raid_cleanup_jobs.json'
+        self.cleanup_jobs = self.load_cleanup_jobs()
+        self.cleanup_tasks = {}
+        self.cleanup_executor = BoundedExecutor(concurrency=5, route_rate=10, route_per=10.0)
+        
+        # Ritmo de mensajes por canal activo para el slowmode automático (channel_id -> ChannelRate)
+        self.channel_rates = {}
+        
+        # Tareas en segundo plano (hashes, enlaces, adjuntos, slowmode): el event loop
+        # solo guarda referencias débiles, así que se conservan aquí hasta que terminan
+        self.background_tasks = set()
+
+        # Verificación por captcha de joins sospechosos
+        self.captcha_pool = CaptchaPool(config.CAPTCHA_POOL_SIZE, config.CAPTCHA_LENGTH)
+        self.captcha_answers = TTLCache(ttl=config.CAPTCHA_ANSWER_TTL)   # (guild_id, member_id) -> respuesta
+        self.captcha_failures = TTLCache(ttl=config.CAPTCHA_TIMEOUT)     # (guild_id, member_id) -> fallos
+        
+        # Escáner de adjuntos contra el corpus local de hashes conocidos
+        self.attachment_scanner = AttachmentScanner(
+            config.ATTACHMENT_KNOWN_BAD_FILE,
+            config.ATTACHMENT_MAX_BYTES,
+            config.ATTACHMENT_IMAGE_MAX_BYTES,
+            concurrency=config.ATTACHMENT_SCAN_CONCURRENCY,
+            phash_distance=config.ATTACHMENT_PHASH_DISTANCE,
+            verdict_ttl=config.ATTACHMENT_VERDICT_TTL
+        )
 
     @commands.Cog.listener()
     async def on_member_join(self, member):
@@ -46,27 +334,70 @@ class Security(commands.Cog):
             
         await self.handle_user_join(member)
 
+    @commands.Cog.listener()
+    async def on_audit_log_entry_create(self, entry):
+        """Registrar entradas de auditoría relevantes según llegan por el gateway"""
+        if entry.action == discord.AuditLogAction.bot_add and entry.target:
+            key = (entry.guild.id, entry.target.id)
+            self.bot_add_entries.set(key, entry)
+            
+            # Despertar al join que ya estaba esperando esta entrada
+            waiter = self.bot_add_waiters.pop(key, None)
+            if waiter and not waiter.done():
+                waiter.set_result(entry)
+        
+        elif entry.action.name in config.ANTI_NUKE_THRESHOLDS:
+            await self.track_destructive_action(entry)
+
+    async def wait_for_bot_add_entry(self, guild, bot_id):
+        """Obtener la entrada bot_add de un bot, esperando un poco si el join llegó antes"""
+        key = (guild.id, bot_id)
+        entry = self.bot_add_entries.get(key)
+        if entry is not None:
+            return entry
+        
+        waiter = self.bot_add_waiters.get(key)
+        if waiter is None:
+            waiter = self.bot_add_waiters[key] = asyncio.get_running_loop().create_future()
+        
+        try:
+            return await asyncio.wait_for(asyncio.shield(waiter), timeout=config.BOT_ADD_AUDIT_WAIT)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            self.bot_add_waiters.pop(key, None)
+
     async def handle_bot_join(self, member):
         """Manejar joins de bots"""
         guild = member.guild
         
         # Verificar si el bot fue añadido por un administrador
-        async for entry in guild.audit_logs(limit=5, action=discord.AuditLogAction.bot_add):
-            if entry.target.id == member.id:
-                # Bot añadido por administrador - considerado seguro
-                if entry.user.guild_permissions.administrator:
-                    print(f"✅ Bot {member.name} añadido por administrador: {entry.user.name}")
-                    return
-                break
+        entry = await self.wait_for_bot_add_entry(guild, member.id)
+        adder = guild.get_member(entry.user_id) if entry else None
+        
+        if adder and adder.guild_permissions.administrator:
+            # Bot añadido por administrador - considerado seguro
+            print(f"✅ Bot {member.name} añadido por administrador: {adder.name}")
+            return
         
         # Bot no autorizado detectado
-        await self.take_action_against_bot(member)
+        await self.take_action_against_bot(member, adder)
 
     async def handle_user_join(self, member):
         """Manejar joins de usuarios normales"""
         guild = member.guild
         now = datetime.now(timezone.utc)
         
+        # Atribuir el join a su invitación antes de decidir el modo raid, para que
+        # activate_raid_mode pueda revocar solo la invitación abusada
+        try:
+            await asyncio.wait_for(self.track_invite_use(member), timeout=5)
+        except asyncio.TimeoutError:
+            pass
+        except Exception as e:
+            # Sin atribución se sigue: las comprobaciones anti-raid no pueden saltarse
+            print(f"⚠️ No se pudo atribuir el join de {member} a una invitación: {e}")
+        
         # Detección de raid por joins masivos
         self.join_times.append(now)
         
@@ -75,27 +406,166 @@ class Security(commands.Cog):
                           if now - join_time < timedelta(seconds=60)]
         
         # Si hay más de 8 joins en 60 segundos, activar modo raid
-        if len(self.join_times) > 8 and not self.raid_mode:
+        if len(self.join_times) > 8 and not self.is_raid_active(guild.id):
             await self.activate_raid_mode(guild, "Joins masivos detectados")
         
         # Verificar cuenta sospechosa
         is_suspicious, reasons = await self.check_suspicious_account(member)
         
         if is_suspicious:
-            self.suspicious_joins.append({
-                'member': member,
-                'reasons': reasons,
-                'timestamp': now
-            })
-            
-            # Si hay más de 3 joins sospechosos en 2 minutos, activar medidas
-            recent_suspicious = [s for s in self.suspicious_joins 
-                               if now - s['timestamp'] < timedelta(minutes=2)]
-            
-            if len(recent_suspicious) > 3 and not self.raid_mode:
-                await self.activate_raid_mode(guild, "Múltiples joins sospechosos")
-            
+            await self.register_suspicious_join(member, reasons, now)
             await self.log_suspicious_account(member, reasons)
+            await self.start_verification(member)
+        
+        # Buscar oleadas de nombres similares (shadow_1234, shad0w_5531...)
+        await self.check_name_cluster(member)
+        
+        # Comparar el avatar con los de otros joins recientes sin bloquear el evento
+        if member.avatar:
+            self.spawn(self.check_avatar_cluster(member))
+
+    async def track_invite_use(self, member):
+        """Registrar qué invitación usó un miembro para poder revocarla en un raid"""
+        code = await self.invite_tracker.attribute(member)
+        if code:
+            joins = self.invite_joins.get(member.guild.id)
+            if joins is None:
+                joins = self.invite_joins[member.guild.id] = deque(maxlen=1000)
+            joins.append((time.monotonic(), code))
+
+    def find_abused_invite(self, guild):
+        """Código de invitación que concentra la mayoría de los joins recientes, si lo hay"""
+        joins = self.invite_joins.get(guild.id)
+        if not joins:
+            return None
+        
+        cutoff = time.monotonic() - 120
+        while joins and joins[0][0] < cutoff:
+            joins.popleft()
+        
+        counts = Counter(code for _, code in joins)
+        if not counts:
+            return None
+        code, count = counts.most_common(1)[0]
+        if count >= 3 and count >= len(joins) * 0.6 and code != guild.vanity_url_code:
+            return code
+        return None
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        # Línea base de invitaciones de todos los servidores (se omiten los ya cargados)
+        await self.invite_tracker.load_all(self.bot.guilds)
+
+    @commands.Cog.listener()
+    async def on_guild_join(self, guild):
+        await self.invite_tracker.load_guild(guild)
+
+    @commands.Cog.listener()
+    async def on_invite_create(self, invite):
+        self.invite_tracker.on_invite_create(invite)
+
+    @commands.Cog.listener()
+    async def on_invite_delete(self, invite):
+        self.invite_tracker.on_invite_delete(invite)
+
+    async def register_suspicious_join(self, member, reasons, now):
+        """Contar un join sospechoso y activar el modo raid si hay demasiados"""
+        self.suspicious_joins.append({
+            'member': member,
+            'reasons': reasons,
+            'timestamp': now
+        })
+        
+        # Si hay más de 3 joins sospechosos en 2 minutos, activar medidas
+        self.suspicious_joins = [s for s in self.suspicious_joins 
+                                 if now - s['timestamp'] < timedelta(minutes=2)]
+        
+        if len(self.suspicious_joins) > 3 and not self.is_raid_active(member.guild.id):
+            await self.activate_raid_mode(member.guild, "Múltiples joins sospechosos")
+
+    async def check_name_cluster(self, member):
+        """Detectar grupos de nombres similares entre los joins recientes (MinHash + LSH)"""
+        name = normalize_name(member.name)
+        if len(name) < 3:
+            return
+        
+        guild = member.guild
+        now = time.monotonic()
+        signature = name_minhash(name)
+        bands = minhash_bands(signature)
+        
+        index = self.name_signatures.get(guild.id)
+        if index is None:
+            index = self.name_signatures[guild.id] = WindowedLSHIndex(config.NAME_CLUSTER_WINDOW)
+        
+        similar = [member_id for other, member_id in index.query(bands, now)
+                   if minhash_similarity(signature, other) >= config.NAME_CLUSTER_SIMILARITY]
+        index.add(bands, (signature, member.id), now)
+        
+        if len(similar) + 1 < config.NAME_CLUSTER_SIZE:
+            return
+        
+        # Recordar quién pertenece al grupo (lo usan otras herramientas como la limpieza de raids)
+        for member_id in [member.id] + similar:
+            self.name_cluster_members.set((guild.id, member_id), name)
+        
+        reason = f"Nombre similar al de {len(similar)} joins recientes"
+        await self.register_suspicious_join(member, [reason], datetime.now(timezone.utc))
+        
+        last_alert = self.name_cluster_alerts.get(guild.id, 0)
+        if now - last_alert < config.NAME_CLUSTER_WINDOW:
+            return
+        self.name_cluster_alerts[guild.id] = now
+        
+        await self.log_security_incident(
+            guild,
+            "👥 Oleada de Nombres Similares",
+            f"**Patrón:** `{name}`\n"
+            f"**Cuentas similares:** {len(similar) + 1}\n"
+            f"**Ventana:** {config.NAME_CLUSTER_WINDOW // 60} minutos\n"
+            f"**Miembros:** {', '.join(f'<@{member_id}>' for member_id in ([member.id] + similar)[:20])}",
+            discord.Color.red()
+        )
+
+    async def check_avatar_cluster(self, member):
+        """Detectar oleadas de cuentas con avatares idénticos o casi idénticos"""
+        guild = member.guild
+        try:
+            data = await get_asset_cache(self.bot).get(member.avatar.with_size(64).with_static_format('png').url)
+            avatar_hash = await asyncio.get_running_loop().run_in_executor(get_image_pool(), dhash, data)
+        except Exception as e:
+            print(f"⚠️ No se pudo calcular el hash del avatar de {member}: {e}")
+            return
+        
+        now = time.monotonic()
+        index = self.avatar_hashes.get(guild.id)
+        if index is None:
+            index = self.avatar_hashes[guild.id] = WindowedBKTree(config.AVATAR_CLUSTER_WINDOW)
+        
+        neighbours = index.search(avatar_hash, config.AVATAR_HASH_DISTANCE, now)
+        index.add(avatar_hash, member.id, now)
+        
+        if len(neighbours) + 1 < config.AVATAR_CLUSTER_SIZE:
+            return
+        
+        reason = f"Avatar casi idéntico al de {len(neighbours)} joins recientes"
+        await self.register_suspicious_join(member, [reason], datetime.now(timezone.utc))
+        
+        # Un solo aviso por ventana para cada servidor
+        last_alert = self.avatar_alerts.get(guild.id, 0)
+        if now - last_alert < config.AVATAR_CLUSTER_WINDOW:
+            return
+        self.avatar_alerts[guild.id] = now
+        
+        cluster = [member.id] + neighbours
+        await self.log_security_incident(
+            guild,
+            "🖼️ Oleada de Avatares Idénticos",
+            f"**Cuentas con el mismo avatar:** {len(cluster)}\n"
+            f"**Ventana:** {config.AVATAR_CLUSTER_WINDOW // 60} minutos\n"
+            f"**Miembros:** {', '.join(f'<@{member_id}>' for member_id in cluster[:20])}",
+            discord.Color.red()
+        )
 
     async def check_suspicious_account(self, member):
         """Verificar si una cuenta es sospechosa"""
@@ -111,41 +581,54 @@ class Security(commands.Cog):
             suspicious_signs.append("Sin avatar personalizado")
         
         # 3. Nombre sospechoso (patrones de bots maliciosos)
-        display_name_lower = member.display_name.lower()
-        for pattern in self.malicious_bot_patterns:
-            if re.search(pattern, display_name_lower):
-                suspicious_signs.append("Nombre coincide con patrones de bots maliciosos")
-                break
+        if self.malicious_name_re.search(member.display_name.lower()):
+            suspicious_signs.append("Nombre coincide con patrones de bots maliciosos")
         
         # 4. Nombre con muchos números
-        for pattern in self.number_patterns:
-            if re.search(pattern, member.display_name):
-                suspicious_signs.append("Nombre con muchos números")
-                break
+        if self.number_name_re.search(member.display_name):
+            suspicious_signs.append("Nombre con muchos números")
         
         # 5. Nombre muy genérico o aleatorio
         if self.is_generic_name(member.display_name):
             suspicious_signs.append("Nombre genérico/aleatorio")
         
-        # 6. Sin banner de perfil
-        if not member.banner:
-            suspicious_signs.append("Sin banner de perfil")
+        # 6. Sin banner de perfil. El gateway no incluye banners, así que solo se
+        #    consulta el perfil completo cuando el resto de señales está en el límite
+        if len(suspicious_signs) == 1:
+            has_banner = await self.fetch_profile_banner(member)
+            if has_banner is False:
+                suspicious_signs.append("Sin banner de perfil")
         
         return len(suspicious_signs) >= 2, suspicious_signs
 
+    async def fetch_profile_banner(self, member):
+        """Saber si el usuario tiene banner; None si no hay presupuesto para consultarlo"""
+        cached = self.profile_cache.get(member.id)
+        if cached is not None:
+            return cached
+        
+        # Presupuesto de peticiones por servidor para no agotar el rate limit en un raid
+        budget = self.enrichment_budgets.get(member.guild.id)
+        if budget is None:
+            budget = self.enrichment_budgets[member.guild.id] = TokenBucket(
+                config.PROFILE_FETCH_BUDGET, per=config.PROFILE_FETCH_PERIOD
+            )
+        if not budget.try_acquire():
+            return None
+        
+        try:
+            user = await self.bot.fetch_user(member.id)
+        except discord.HTTPException:
+            return None
+        
+        has_banner = user.banner is not None
+        self.profile_cache.set(member.id, has_banner)
+        return has_banner
+
     def is_generic_name(self, name):
         """Detectar nombres genéricos o aleatorios"""
-        generic_patterns = [
-            r'^[a-z]+[0-9]+$',  # palabranúmeros
-            r'^[0-9]+[a-z]+$',  # númerospalabra
-            r'^[a-z]+\.[a-z]+$',  # palabra.palabra
-            r'^[a-z]+_[a-z]+$',  # palabra_palabra
-        ]
-        
-        name_lower = name.lower()
-        for pattern in generic_patterns:
-            if re.match(pattern, name_lower):
-                return True
+        if self.generic_name_re.match(name.lower()):
+            return True
         
         # Números excesivos en el nombre
         digit_count = sum(c.isdigit() for c in name)
@@ -154,8 +637,9 @@ class Security(commands.Cog):
             
         return False
 
-    async def take_action_against_bot(self, member):
+    async def take_action_against_bot(self, member, adder=None):
         """Tomar acción contra bots no autorizados"""
+        added_by = f"{adder.mention} (`{adder.id}`)" if adder else "Desconocido"
         try:
             # 1. Expulsar el bot
             await member.kick(reason="Bot no autorizado detectado")
@@ -166,6 +650,7 @@ class Security(commands.Cog):
                 "🚫 BOT NO AUTORIZADO EXPULSADO",
                 f"**Bot:** {member.mention} (`{member.name}`)\n"
                 f"**ID:** {member.id}\n"
+                f"**Añadido por:** {added_by}\n"
                 f"**Razón:** Bot añadido sin autorización administrativa",
                 discord.Color.red()
             )
@@ -186,35 +671,421 @@ class Security(commands.Cog):
                 discord.Color.orange()
             )
 
+    async def track_destructive_action(self, entry):
+        """Contar acciones destructivas por usuario y reaccionar ante ráfagas"""
+        guild = entry.guild
+        if entry.user_id is None or entry.user_id in (self.bot.user.id, guild.owner_id):
+            return
+        if entry.user_id in self.verified_users:
+            return
+        
+        tracker = self.nuke_trackers.get(guild.id)
+        if tracker is None:
+            tracker = self.nuke_trackers[guild.id] = NukeTracker(config.ANTI_NUKE_THRESHOLDS, config.ANTI_NUKE_MAX_ACTORS)
+        
+        if tracker.record(entry.user_id, entry.action.name, time.monotonic()):
+            await self.handle_nuke_attempt(guild, entry.user_id, entry.action.name)
+
+    async def get_or_create_quarantine_role(self, guild):
+        """Obtener o crear el rol de cuarentena (sin permisos)"""
+        role = discord.utils.get(guild.roles, name=config.QUARANTINE_ROLE_NAME)
+        if not role:
+            role = await guild.create_role(
+                name=config.QUARANTINE_ROLE_NAME,
+                permissions=discord.Permissions.none(),
+                reason="Rol de cuarentena anti-nuke"
+            )
+        return role
+
+    async def handle_nuke_attempt(self, guild, user_id, action):
+        """Neutralizar a un usuario que está destruyendo el servidor"""
+        limit, seconds = config.ANTI_NUKE_THRESHOLDS[action]
+        responses = config.ANTI_NUKE_RESPONSES
+        member = guild.get_member(user_id)
+        applied = []
+        
+        if member and ('strip_roles' in responses or 'quarantine' in responses):
+            # Un lote pendiente (p. ej. reaction roles) no debe devolverle roles después
+            get_role_batcher(self.bot).discard(member)
+            reason = f"Anti-nuke: {action} masivo"
+            
+            # Primero los roles: si además se pidiera el aislamiento en la misma llamada,
+            # un administrador (no se le puede aislar) conservaría todos sus roles
+            try:
+                # Se conservan los roles que el bot no puede quitar (gestionados o superiores)
+                roles = member.roles[1:]
+                if 'strip_roles' in responses:
+                    roles = [role for role in roles if role.managed or role >= guild.me.top_role]
+                if 'quarantine' in responses:
+                    roles.append(await self.get_or_create_quarantine_role(guild))
+                
+                await member.edit(roles=roles, reason=reason)
+                if 'strip_roles' in responses:
+                    applied.append("🧹 Roles retirados")
+                if 'quarantine' in responses:
+                    applied.append("🔒 Rol de cuarentena")
+            except discord.Forbidden:
+                applied.append("❌ Sin permisos para cambiar sus roles")
+            except discord.HTTPException as e:
+                applied.append(f"❌ Error cambiando sus roles: {e}")
+            
+            if 'quarantine' in responses:
+                try:
+                    await member.timeout(timedelta(hours=config.QUARANTINE_TIMEOUT_HOURS), reason=reason)
+                    applied.append(f"⏱️ Aislado {config.QUARANTINE_TIMEOUT_HOURS}h")
+                except discord.Forbidden:
+                    applied.append("❌ Sin permisos para aislarlo")
+                except discord.HTTPException as e:
+                    applied.append(f"❌ Error aislándolo: {e}")
+        
+        if 'alert' in responses:
+            target = member.mention if member else f"<@{user_id}>"
+            await self.log_security_incident(
+                guild,
+                "☢️ INTENTO DE NUKE DETECTADO",
+                f"**Usuario:** {target} (`{user_id}`)\n"
+                f"**Acción:** `{action}` ({limit} o más en {seconds}s)\n"
+                f"**Medidas:** {', '.join(applied) if applied else 'Ninguna'}",
+                discord.Color.dark_red()
+            )
+            await self.notify_admins(
+                guild,
+                f"☢️ **Intento de nuke detectado**\n"
+                f"{target} realizó `{action}` de forma masiva. Medidas: {', '.join(applied) if applied else 'ninguna'}."
+            )
+
+    # VERIFICACIÓN POR CAPTCHA
+
+    def get_verification_role(self, guild):
+        """Rol restringido de los miembros pendientes de verificar (None si no se configuró)"""
+        return discord.utils.get(guild.roles, name=config.CAPTCHA_ROLE_NAME)
+
+    async def start_verification(self, member):
+        """Restringir a un join sospechoso hasta que resuelva el captcha"""
+        if not config.CAPTCHA_ENABLED:
+            return
+
+        role = self.get_verification_role(member.guild)
+        if not role:
+            return  # Verificación no configurada en este servidor (ver verification_setup)
+
+        # La reserva de captchas se llena solo cuando alguien va a necesitarlos
+        self.captcha_pool.start()
+
+        if not await get_role_batcher(self.bot).add(member, role, reason="Cuenta sospechosa: verificación por captcha"):
+            return
+
+        channel = discord.utils.get(member.guild.text_channels, name=config.CAPTCHA_CHANNEL_NAME)
+        try:
+            await member.send(
+                f"🔒 **{member.guild.name}** necesita verificar tu cuenta.\n"
+                f"Pulsa **Verificarme** en {channel.mention if channel else 'el canal de verificación'} "
+                f"antes de {config.CAPTCHA_TIMEOUT // 60} minutos o serás expulsado."
+            )
+        except discord.HTTPException:
+            pass  # DMs cerrados: el canal de verificación sigue siendo visible
+
+    async def send_captcha(self, interaction):
+        """Enviar un captcha pre-renderizado al miembro que pulsó el botón"""
+        member = interaction.user
+        role = self.get_verification_role(interaction.guild)
+        if not role or role not in member.roles:
+            await interaction.response.send_message("✅ Tu cuenta no necesita verificación.", ephemeral=True)
+            return
+
+        # Con la reserva vacía el captcha se renderiza ahora: responder antes del límite de 3 s
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        self.captcha_pool.start()
+        answer, image = await self.captcha_pool.get()
+        self.captcha_answers.set((interaction.guild.id, member.id), answer)
+        await interaction.followup.send(
+            f"🧩 Escribe los caracteres de la imagen. Tienes {config.CAPTCHA_ANSWER_TTL // 60} minutos.",
+            file=discord.File(io.BytesIO(image), filename='captcha.png'),
+            view=CaptchaAnswerView(),
+            ephemeral=True
+        )
+
+    async def check_captcha(self, interaction, answer):
+        """Comprobar la respuesta de un captcha"""
+        guild = interaction.guild
+        member = interaction.user
+        key = (guild.id, member.id)
+        expected = self.captcha_answers.pop(key)
+
+        if expected is None:
+            await interaction.response.send_message("⌛ El captcha caducó. Pulsa **Verificarme** para recibir otro.", ephemeral=True)
+            return
+
+        if answer.strip().upper().replace(' ', '') == expected:
+            self.captcha_failures.pop(key)
+            role = self.get_verification_role(guild)
+            if role and role in member.roles:
+                get_role_batcher(self.bot).remove(member, role, reason="Captcha resuelto")
+            await interaction.response.send_message("✅ ¡Verificado! Ya tienes acceso al servidor.", ephemeral=True)
+            return
+
+        failures = self.captcha_failures.get(key, 0) + 1
+        self.captcha_failures.set(key, failures)
+        if failures < config.CAPTCHA_MAX_ATTEMPTS:
+            await interaction.response.send_message(
+                f"❌ Respuesta incorrecta ({failures}/{config.CAPTCHA_MAX_ATTEMPTS}). Pulsa **Verificarme** para intentarlo de nuevo.",
+                ephemeral=True
+            )
+            return
+
+        await interaction.response.send_message("❌ Demasiados intentos fallidos.", ephemeral=True)
+        self.captcha_failures.pop(key)
+        try:
+            await member.kick(reason="Captcha fallado demasiadas veces")
+        except discord.HTTPException as e:
+            print(f"❌ No se pudo expulsar a {member}: {e}")
+            return
+        await self.log_security_incident(
+            guild,
+            "🧩 Captcha fallido",
+            f"**Usuario:** {member} (`{member.id}`)\n"
+            f"**Acción:** Expulsado tras {config.CAPTCHA_MAX_ATTEMPTS} intentos fallidos",
+            discord.Color.orange()
+        )
+
+    @tasks.loop(minutes=1)
+    async def verification_sweep(self):
+        """Expulsar a quien no se verificó a tiempo"""
+        # Se deduce del rol y de joined_at, así que sobrevive a reinicios sin guardar estado
+        cutoff = discord.utils.utcnow() - timedelta(seconds=config.CAPTCHA_TIMEOUT)
+
+        for guild in self.bot.guilds:
+            role = self.get_verification_role(guild)
+            if not role:
+                continue
+
+            expired = [member for member in role.members
+                       if member.joined_at and member.joined_at < cutoff]
+            if not expired:
+                continue
+
+            results = await self.cleanup_executor.map(
+                (('kick', guild.id), functools.partial(member.kick, reason="Verificación por captcha no completada"))
+                for member in expired
+            )
+            kicked = sum(1 for result in results if not isinstance(result, Exception))
+            if kicked:
+                await self.log_security_incident(
+                    guild,
+                    "🧩 Verificaciones caducadas",
+                    f"**Expulsados:** {kicked} miembros sin verificar tras {config.CAPTCHA_TIMEOUT // 60} minutos",
+                    discord.Color.orange()
+                )
+
+    @verification_sweep.before_loop
+    async def before_verification_sweep(self):
+        await self.bot.wait_until_ready()
+
+    def load_lockdown_snapshots(self):
+        """Cargar los snapshots de bloqueo pendientes de restaurar"""
+        try:
+            with open(self.lockdown_file, 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def save_lockdown_snapshots(self):
+        """Guardar los snapshots de bloqueo para sobrevivir a reinicios"""
+        os.makedirs('data', exist_ok=True)
+        with open(self.lockdown_file, 'w') as f:
+            json.dump(self.lockdown_snapshots, f, indent=4)
+
+    def load_cleanup_jobs(self):
+        """Cargar los trabajos de limpieza de raid sin terminar"""
+        try:
+            with open(self.cleanup_file, 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def save_cleanup_jobs(self):
+        """Guardar el progreso de los trabajos de limpieza"""
+        os.makedirs('data', exist_ok=True)
+        with open(self.cleanup_file, 'w') as f:
+            json.dump(self.cleanup_jobs, f, indent=4)
+
+    async def cog_load(self):
+        self.slowmode_decay.start()
+        self.verification_sweep.start()
+        self.bot.add_view(VerificationPanelView())
+        
+        # Reprogramar la desactivación de bloqueos que quedaron activos antes de un reinicio
+        for guild_id, snapshot in self.lockdown_snapshots.items():
+            remaining = snapshot.get('expires_at', 0) - time.time()
+            self.schedule_raid_deactivation(int(guild_id), max(remaining, 0))
+        
+        # Reanudar limpiezas de raid interrumpidas donde se quedaron
+        for job_id in self.cleanup_jobs:
+            self.cleanup_tasks[job_id] = asyncio.create_task(self.run_cleanup_job(job_id))
+
+    def cog_unload(self):
+        self.slowmode_decay.cancel()
+        self.verification_sweep.cancel()
+        self.captcha_pool.close()
+        for task in self.background_tasks:
+            task.cancel()
+        self.spawn(self.attachment_scanner.close())
+        for task in self.raid_tasks.values():
+            task.cancel()
+        for task in self.cleanup_tasks.values():
+            task.cancel()
+        self.log_sink.close()
+
+    def spawn(self, coro):
+        """Lanzar una tarea en segundo plano guardando la referencia y registrando sus errores"""
+        task = asyncio.create_task(coro)
+        self.background_tasks.add(task)
+        task.add_done_callback(self._background_task_done)
+        return task
+
+    def _background_task_done(self, task):
+        self.background_tasks.discard(task)
+        if not task.cancelled() and task.exception():
+            print(f"❌ Error en tarea de seguridad: {task.exception()!r}")
+
+    def is_raid_active(self, guild_id):
+        """Indica si el servidor está en modo raid"""
+        return str(guild_id) in self.lockdown_snapshots
+
+    def schedule_raid_deactivation(self, guild_id, delay):
+        """Programar la desactivación automática del modo raid"""
+        previous = self.raid_tasks.pop(guild_id, None)
+        if previous:
+            previous.cancel()
+        self.raid_tasks[guild_id] = asyncio.create_task(self._auto_deactivate(guild_id, delay))
+
+    async def _auto_deactivate(self, guild_id, delay):
+        await self.bot.wait_until_ready()
+        await asyncio.sleep(delay)
+        self.raid_tasks.pop(guild_id, None)
+        guild = self.bot.get_guild(guild_id)
+        if guild:
+            await self.deactivate_raid_mode(guild)
+
+    async def lock_channels(self, guild, snapshot):
+        """Bloquear los canales de texto en paralelo guardando sus permisos originales"""
+        everyone = guild.default_role
+        jobs = []
+        pending = []
+        
+        for channel in guild.text_channels:
+            if not channel.permissions_for(everyone).send_messages:
+                continue
+            
+            original = channel.overwrites.get(everyone)
+            overwrite = channel.overwrites_for(everyone)
+            overwrite.send_messages = False
+            
+            jobs.append((
+                ('channel_permissions', channel.id),
+                functools.partial(channel.set_permissions, everyone, overwrite=overwrite, reason="Modo raid activado")
+            ))
+            pending.append((channel, [v.value for v in original.pair()] if original else None))
+        
+        results = await self.lockdown_executor.map(jobs)
+        
+        # Solo se guardan en el snapshot los canales que realmente se modificaron
+        locked = []
+        for (channel, original), result in zip(pending, results):
+            if isinstance(result, Exception):
+                print(f"❌ No se pudo bloquear {channel.name}: {result}")
+                continue
+            snapshot['channels'][str(channel.id)] = original
+            locked.append(channel)
+        return locked
+
+    async def restore_channels(self, guild, snapshot):
+        """Restaurar exactamente los permisos guardados en el snapshot.
+        
+        Los canales restaurados (o que ya no existen) salen del snapshot; los que
+        fallan se quedan en él para reintentarlo.
+        """
+        everyone = guild.default_role
+        channels = snapshot.setdefault('channels', {})
+        jobs = []
+        pending = []
+        
+        for channel_id, original in list(channels.items()):
+            channel = guild.get_channel(int(channel_id))
+            if not channel:
+                del channels[channel_id]
+                continue
+            
+            if original is None:
+                overwrite = None  # No existía: se elimina el overwrite
+            else:
+                allow, deny = original
+                overwrite = discord.PermissionOverwrite.from_pair(discord.Permissions(allow), discord.Permissions(deny))
+            
+            jobs.append((
+                ('channel_permissions', channel.id),
+                functools.partial(channel.set_permissions, everyone, overwrite=overwrite, reason="Modo raid desactivado")
+            ))
+            pending.append((channel_id, channel))
+        
+        results = await self.lockdown_executor.map(jobs)
+        restored = 0
+        for (channel_id, channel), result in zip(pending, results):
+            if isinstance(result, Exception):
+                print(f"❌ No se pudo restaurar {channel.name}: {result}")
+                continue
+            del channels[channel_id]
+            restored += 1
+        return restored
+
     async def activate_raid_mode(self, guild, reason):
         """Activar modo raid con medidas de seguridad"""
-        if self.raid_mode:
+        if self.is_raid_active(guild.id):
             return
-            
-        self.raid_mode = True
         
-        # Buscar o crear canal de logs
-        log_channel = await self.get_or_create_log_channel(guild)
+        snapshot = {
+            'channels': {},
+            'verification_level': None,
+            'invites_disabled': False,
+            'expires_at': time.time() + 900  # 15 minutos
+        }
+        self.lockdown_snapshots[str(guild.id)] = snapshot
         
         # Aplicar medidas de seguridad
         security_measures = []
         
         try:
-            # 1. Desactivar invites temporalmente
-            for channel in guild.text_channels:
-                if channel.permissions_for(guild.default_role).send_messages:
-                    await channel.set_permissions(guild.default_role, send_messages=False)
-                    security_measures.append(f"🔒 {channel.mention}")
+            # 1. Bloquear canales de texto
+            locked = await self.lock_channels(guild, snapshot)
+            self.save_lockdown_snapshots()
+            if locked:
+                preview = ", ".join(channel.mention for channel in locked[:10])
+                if len(locked) > 10:
+                    preview += f" y {len(locked) - 10} más"
+                security_measures.append(f"🔒 {len(locked)} canales bloqueados: {preview}")
             
             # 2. Activar verificación de nivel medio
-            original_verification = guild.verification_level
             if guild.verification_level.value < 2:  # Menos que MEDIUM
+                snapshot['verification_level'] = guild.verification_level.value
                 await guild.edit(verification_level=discord.VerificationLevel.medium)
                 security_measures.append("🛡️ Verificación nivel MEDIUM")
             
-            # 3. Desactivar creación de invites
-            await guild.edit(invites_disabled=True)
-            security_measures.append("🚫 Invites desactivados")
+            # 3. Revocar solo la invitación usada por el raid; si no se sabe cuál, pausar todas
+            abused = self.find_abused_invite(guild)
+            if abused:
+                try:
+                    await self.bot.delete_invite(abused)
+                    snapshot['revoked_invite'] = abused
+                    security_measures.append(f"✂️ Invitación `{abused}` revocada")
+                except discord.HTTPException:
+                    abused = None
+            
+            if not abused and 'INVITES_DISABLED' not in guild.features:
+                await guild.edit(invites_disabled=True)
+                snapshot['invites_disabled'] = True
+                security_measures.append("🚫 Invites desactivados")
+            
+            self.save_lockdown_snapshots()
             
             embed = discord.Embed(
                 title="🚨 MODO RAID ACTIVADO",
@@ -230,7 +1101,7 @@ class Security(commands.Cog):
                 inline=True
             )
             
-            await log_channel.send(embed=embed)
+            self.log_sink.push(guild, embed)
             
             # Notificar a todos los administradores
             await self.notify_admins(
@@ -240,51 +1111,77 @@ class Security(commands.Cog):
                 f"El servidor está bajo medidas de seguridad automáticas."
             )
             
-            # Programar desactivación automática después de 15 minutos
-            await asyncio.sleep(900)  # 15 minutos
-            await self.deactivate_raid_mode(guild)
-            
         except Exception as e:
-            await log_channel.send(f"❌ Error activando modo raid: {str(e)}")
+            self.save_lockdown_snapshots()
+            await self.log_security_incident(guild, "❌ Error activando modo raid", str(e), discord.Color.orange())
+        
+        # Programar desactivación automática después de 15 minutos
+        self.schedule_raid_deactivation(guild.id, 900)
 
     async def deactivate_raid_mode(self, guild):
         """Desactivar modo raid"""
-        if not self.raid_mode:
+        snapshot = self.lockdown_snapshots.get(str(guild.id))
+        if snapshot is None:
             return
-            
-        self.raid_mode = False
         
-        log_channel = await self.get_or_create_log_channel(guild)
+        task = self.raid_tasks.pop(guild.id, None)
+        if task and task is not asyncio.current_task():
+            task.cancel()
         
-        try:
-            # Reactivar permisos de canales
-            for channel in guild.text_channels:
-                if not channel.permissions_for(guild.default_role).send_messages:
-                    await channel.set_permissions(guild.default_role, send_messages=True)
-            
-            # Reactivar invites
-            await guild.edit(invites_disabled=False)
-            
-            embed = discord.Embed(
-                title="✅ MODO RAID DESACTIVADO",
-                description="Todas las medidas de seguridad han sido levantadas.",
-                color=discord.Color.green(),
-                timestamp=datetime.now(timezone.utc)
+        # Cada medida se restaura por separado: un fallo no impide levantar las demás
+        failures = []
+        
+        # Restaurar los permisos originales de los canales
+        restored = await self.restore_channels(guild, snapshot)
+        if snapshot['channels']:
+            failures.append(f"{len(snapshot['channels'])} canales siguen bloqueados")
+        
+        # Restaurar verificación e invites solo si los cambiamos nosotros
+        if snapshot.get('verification_level') is not None:
+            try:
+                await guild.edit(verification_level=discord.VerificationLevel(snapshot['verification_level']))
+                snapshot['verification_level'] = None
+            except discord.HTTPException as e:
+                failures.append(f"Nivel de verificación: {e}")
+        
+        if snapshot.get('invites_disabled'):
+            try:
+                await guild.edit(invites_disabled=False)
+                snapshot['invites_disabled'] = False
+            except discord.HTTPException as e:
+                failures.append(f"Invites: {e}")
+        
+        if failures:
+            # El snapshot conserva solo lo pendiente; se reintenta más tarde
+            self.save_lockdown_snapshots()
+            self.schedule_raid_deactivation(guild.id, 300)
+            await self.log_security_incident(
+                guild,
+                "❌ Error desactivando modo raid",
+                f"**Canales restaurados:** {restored}\n**Pendiente (reintento en 5 min):**\n" + "\n".join(failures),
+                discord.Color.orange()
             )
-            
-            await log_channel.send(embed=embed)
-            
-            # Limpiar listas de tracking
-            self.join_times.clear()
-            self.suspicious_joins.clear()
-            
-        except Exception as e:
-            await log_channel.send(f"❌ Error desactivando modo raid: {str(e)}")
+            return
+        
+        self.lockdown_snapshots.pop(str(guild.id), None)
+        self.save_lockdown_snapshots()
+        
+        embed = discord.Embed(
+            title="✅ MODO RAID DESACTIVADO",
+            description="Todas las medidas de seguridad han sido levantadas.\n"
+                      f"**Canales restaurados:** {restored}",
+            color=discord.Color.green(),
+            timestamp=datetime.now(timezone.utc)
+        )
+        
+        self.log_sink.push(guild, embed)
+        
+        # Limpiar listas de tracking
+        self.join_times.clear()
+        self.suspicious_joins.clear()
 
     async def log_suspicious_account(self, member, reasons):
         """Registrar cuenta sospechosa"""
-        log_channel = await self.get_or_create_log_channel(member.guild)
-        
         embed = discord.Embed(
             title="⚠️ Cuenta Sospechosa Detectada",
             description=f"**Usuario:** {member.mention}\n**ID:** {member.id}",
@@ -305,36 +1202,14 @@ class Security(commands.Cog):
             inline=True
         )
         
-        await log_channel.send(embed=embed)
+        self.log_sink.push(member.guild, embed)
 
     async def get_or_create_log_channel(self, guild):
         """Obtener o crear canal de logs de seguridad"""
-        log_channel = discord.utils.get(guild.text_channels, name="🔒security-logs")
-        
-        if not log_channel:
-            # Crear canal de logs si no existe
-            overwrites = {
-                guild.default_role: discord.PermissionOverwrite(read_messages=False),
-                guild.me: discord.PermissionOverwrite(read_messages=True, send_messages=True)
-            }
-            
-            # Agregar permisos para administradores
-            admin_role = guild.get_role(config.ROLES["ADMIN"])
-            if admin_role:
-                overwrites[admin_role] = discord.PermissionOverwrite(read_messages=True, send_messages=True)
-            
-            log_channel = await guild.create_text_channel(
-                "🔒security-logs",
-                overwrites=overwrites,
-                reason="Canal de logs de seguridad automático"
-            )
-        
-        return log_channel
+        return await self.log_sink.get_channel(guild)
 
     async def log_security_incident(self, guild, title, description, color):
-        """Registrar incidente de seguridad"""
-        log_channel = await self.get_or_create_log_channel(guild)
-        
+        """Registrar incidente de seguridad (se envía agrupado con otros)"""
         embed = discord.Embed(
             title=title,
             description=description,
@@ -342,11 +1217,15 @@ class Security(commands.Cog):
             timestamp=datetime.now(timezone.utc)
         )
         
-        await log_channel.send(embed=embed)
+        self.log_sink.push(guild, embed)
+
+    @commands.Cog.listener()
+    async def on_guild_channel_delete(self, channel):
+        self.log_sink.invalidate(channel.id)
 
     async def notify_admins(self, guild, message):
         """Notificar a los administradores"""
-        admin_role = guild.get_role(config.ROLES["ADMIN"])
+        admin_role = get_config_role(guild, "ADMIN")
         if admin_role:
             # Buscar un canal donde enviar la notificación
             for channel in guild.text_channels:
@@ -363,6 +1242,9 @@ class Security(commands.Cog):
         if message.author.bot:
             return
         
+        # Slowmode automático según el ritmo de mensajes del canal
+        self.update_auto_slowmode(message)
+        
         # Anti spam de menciones
         if len(message.mentions) > 5:
             await self.handle_mention_spam(message)
@@ -373,9 +1255,99 @@ class Security(commands.Cog):
             await self.handle_suspicious_links(message)
             return
         
+        # Invitaciones a otros servidores (la resolución puede consultar la API)
+        if config.INVITE_FILTER_ENABLED and message.guild:
+            codes = extract_invite_codes(message.content)
+            if codes and not message.author.guild_permissions.manage_messages:
+                self.spawn(self.check_invite_links(message, codes))
+        
+        # Adjuntos conocidos: se descargan y comparan en segundo plano
+        if message.attachments and message.guild and config.ATTACHMENT_SCAN_ENABLED:
+            self.spawn(self.scan_attachments(message))
+        
         # Anti spam de mensajes rápidos
         await self.check_message_spam(message)
 
+    def update_auto_slowmode(self, message):
+        """Actualizar el ritmo del canal (O(1)) y ajustar el slowmode si cruza un umbral"""
+        channel = message.channel
+        if not config.AUTO_SLOWMODE_ENABLED or not isinstance(channel, discord.TextChannel):
+            return
+        
+        now = time.monotonic()
+        state = self.channel_rates.get(channel.id)
+        if state is None:
+            state = self.channel_rates[channel.id] = ChannelRate(now)
+        state.add_message(now, config.AUTO_SLOWMODE_TAU)
+        
+        if state.editing or now - state.changed < config.AUTO_SLOWMODE_COOLDOWN:
+            return
+        target = self.target_slowmode_level(state)
+        if target != state.level:
+            self.spawn(self.apply_auto_slowmode(channel, state, target))
+
+    def target_slowmode_level(self, state):
+        """Nivel de slowmode deseado, con histéresis para no oscilar"""
+        levels = config.AUTO_SLOWMODE_LEVELS
+        rate = state.rate
+        
+        target = state.level
+        while target + 1 < len(levels) and rate >= levels[target + 1][0]:
+            target += 1
+        if target == state.level and target > 0 and rate < levels[target][0] * config.AUTO_SLOWMODE_HYSTERESIS:
+            target -= 1
+        return target
+
+    async def apply_auto_slowmode(self, channel, state, level):
+        """Cambiar el slowmode del canal respetando el tiempo mínimo entre ediciones"""
+        now = time.monotonic()
+        if state.editing or now - state.changed < config.AUTO_SLOWMODE_COOLDOWN:
+            return
+        
+        # Si el staff puso un slowmode a mano (distinto del último que aplicó el bot), o no
+        # podemos editar el canal, no lo tocamos; el salto cuenta para el tiempo mínimo y así
+        # los mensajes siguientes no lanzan una tarea inútil cada uno
+        expected = config.AUTO_SLOWMODE_LEVELS[state.level][1]
+        if channel.slowmode_delay != expected or not channel.permissions_for(channel.guild.me).manage_channels:
+            state.changed = now
+            return
+        
+        delay = config.AUTO_SLOWMODE_LEVELS[level][1]
+        state.editing = True
+        try:
+            await channel.edit(slowmode_delay=delay, reason=f"Slowmode automático ({state.rate:.1f} mensajes/s)")
+            state.level = level
+            state.changed = time.monotonic()
+        except discord.HTTPException as e:
+            print(f"❌ No se pudo ajustar el slowmode de {channel.name}: {e}")
+            state.changed = time.monotonic()
+        finally:
+            state.editing = False
+
+    @tasks.loop(seconds=30)
+    async def slowmode_decay(self):
+        """Bajar el slowmode de canales que se han calmado y olvidar los inactivos"""
+        now = time.monotonic()
+        for channel_id, state in list(self.channel_rates.items()):
+            state.decay(now, config.AUTO_SLOWMODE_TAU)
+            if state.level == 0:
+                if state.rate < 0.01:
+                    del self.channel_rates[channel_id]
+                continue
+            
+            channel = self.bot.get_channel(channel_id)
+            if channel is None:
+                del self.channel_rates[channel_id]
+                continue
+            
+            target = self.target_slowmode_level(state)
+            if target != state.level:
+                await self.apply_auto_slowmode(channel, state, target)
+
+    @slowmode_decay.before_loop
+    async def before_slowmode_decay(self):
+        await self.bot.wait_until_ready()
+
     async def handle_mention_spam(self, message):
         """Manejar spam de menciones"""
         try:
@@ -439,10 +1411,150 @@ class Security(commands.Cog):
         except discord.Forbidden:
             pass
 
+    async def check_invite_links(self, message, codes):
+        """Eliminar invitaciones que llevan a servidores ajenos"""
+        guild = message.guild
+        own = self.invite_tracker.codes(guild.id)
+        if guild.vanity_url_code:
+            own.add(guild.vanity_url_code)
+        
+        external = []
+        for code in codes:
+            if code in own:
+                continue
+            guild_id = await self.invite_resolver.resolve(code)
+            # Códigos inexistentes o caducados no llevan a ninguna parte
+            if guild_id is not None and guild_id != guild.id and guild_id not in config.INVITE_ALLOWED_GUILDS:
+                external.append((code, guild_id))
+        
+        if not external:
+            return
+        
+        try:
+            await message.delete()
+        except discord.NotFound:
+            pass
+        except discord.HTTPException as e:
+            print(f"❌ No se pudo eliminar la invitación externa: {e}")
+            return
+        
+        await self.log_security_incident(
+            guild,
+            "📨 Invitación Externa Eliminada",
+            f"**Usuario:** {message.author.mention}\n"
+            f"**Canal:** {message.channel.mention}\n"
+            f"**Invitaciones:** {', '.join(f'`{code}` (servidor `{guild_id}`)' for code, guild_id in external)}",
+            discord.Color.orange()
+        )
+
+    async def scan_attachments(self, message):
+        """Eliminar mensajes cuyos adjuntos coinciden con el corpus de hashes maliciosos"""
+        verdicts = await asyncio.gather(
+            *(self.attachment_scanner.scan(attachment) for attachment in message.attachments),
+            return_exceptions=True
+        )
+        matches = [(attachment, verdict) for attachment, verdict in zip(message.attachments, verdicts)
+                   if verdict and not isinstance(verdict, Exception)]
+        if not matches:
+            return
+        
+        try:
+            await message.delete()
+        except discord.NotFound:
+            pass
+        except discord.HTTPException as e:
+            print(f"❌ No se pudo eliminar el adjunto malicioso: {e}")
+        
+        await self.log_security_incident(
+            message.guild,
+            "📎 Adjunto Malicioso Eliminado",
+            f"**Usuario:** {message.author.mention}\n"
+            f"**Canal:** {message.channel.mention}\n"
+            + "\n".join(f"**{attachment.filename}:** {verdict}" for attachment, verdict in matches),
+            discord.Color.red()
+        )
+
     async def check_message_spam(self, message):
-        """Verificar spam de mensajes rápidos"""
-        # Esta función puede expandirse para tracking de spam más avanzado
-        pass
+        """Detectar floods de mensajes idénticos o casi idénticos entre cuentas"""
+        if not message.guild:
+            return
+        
+        content = normalize_text(message.content)
+        if len(content) < config.DUPLICATE_MIN_LENGTH:
+            return
+        
+        now = time.monotonic()
+        fingerprint = simhash(content)
+        bands = simhash_bands(fingerprint)
+        
+        index = self.message_fingerprints.get(message.guild.id)
+        if index is None:
+            index = self.message_fingerprints[message.guild.id] = WindowedLSHIndex(config.DUPLICATE_FLOOD_WINDOW)
+        
+        # Solo se comparan las entradas que comparten alguna banda LSH
+        matches = [match for match in index.query(bands, now)
+                   if hamming(match[0], fingerprint) <= SIMHASH_MAX_DISTANCE]
+        # Entrada: [huella, autor, canal, mensaje, ya eliminado]
+        entry = [fingerprint, message.author.id, message.channel.id, message.id, False]
+        index.add(bands, entry, now)
+        
+        authors = {match[1] for match in matches}
+        authors.add(message.author.id)
+        
+        if (len(matches) + 1 >= config.DUPLICATE_FLOOD_MESSAGES and
+                len(authors) >= config.DUPLICATE_FLOOD_ACCOUNTS):
+            entry[4] = True
+            await self.handle_duplicate_flood(message, matches, authors)
+
+    async def handle_duplicate_flood(self, message, matches, authors):
+        """Eliminar un flood de mensajes duplicados y registrarlo"""
+        guild = message.guild
+        
+        # Agrupar por canal para borrar en bloque
+        by_channel = {message.channel.id: [message]}
+        for entry in matches:
+            _, _, channel_id, message_id, handled = entry
+            channel = guild.get_channel(channel_id)
+            if channel and not handled:
+                by_channel.setdefault(channel_id, []).append(channel.get_partial_message(message_id))
+            entry[4] = True
+        
+        deleted = 0
+        for channel_id, messages in by_channel.items():
+            channel = guild.get_channel(channel_id) or message.channel
+            # delete_messages admite como mucho 100 mensajes por llamada
+            for start in range(0, len(messages), 100):
+                chunk = messages[start:start + 100]
+                try:
+                    if len(chunk) == 1:
+                        await chunk[0].delete()
+                    else:
+                        await channel.delete_messages(chunk)
+                    deleted += len(chunk)
+                except discord.Forbidden:
+                    break
+                except discord.NotFound:
+                    continue
+                except discord.HTTPException as e:
+                    print(f"❌ Error borrando flood en {channel_id}: {e}")
+        
+        # Un solo aviso por ventana aunque el flood continúe
+        now = time.monotonic()
+        last_alert = self.flood_alerts.get(guild.id, 0)
+        if now - last_alert < config.DUPLICATE_FLOOD_WINDOW:
+            return
+        self.flood_alerts[guild.id] = now
+        
+        await self.log_security_incident(
+            guild,
+            "📑 Flood de Mensajes Duplicados",
+            f"**Mensajes casi idénticos:** {len(matches) + 1}\n"
+            f"**Cuentas implicadas:** {len(authors)}\n"
+            f"**Canales:** {', '.join(f'<#{cid}>' for cid in by_channel)}\n"
+            f"**Mensajes eliminados:** {deleted}\n"
+            f"**Contenido:** {message.content[:100]}...",
+            discord.Color.red()
+        )
 
     # COMANDOS DE ADMINISTRACIÓN
 
@@ -455,7 +1567,10 @@ class Security(commands.Cog):
             await ctx.send("✅ Modo raid activado manualmente")
         else:
             await self.deactivate_raid_mode(ctx.guild)
-            await ctx.send("✅ Modo raid desactivado")
+            if self.is_raid_active(ctx.guild.id):
+                await ctx.send("⚠️ Algunas medidas no se pudieron levantar; se reintentará en 5 minutos (ver logs de seguridad)")
+            else:
+                await ctx.send("✅ Modo raid desactivado")
 
     @commands.hybrid_command(name='security_status', description='Estado del sistema de seguridad')
     @commands.has_permissions(administrator=True)
@@ -469,7 +1584,7 @@ class Security(commands.Cog):
         
         embed.add_field(
             name="🚨 Modo Raid",
-            value="**ACTIVADO**" if self.raid_mode else "**Desactivado**",
+            value="**ACTIVADO**" if self.is_raid_active(ctx.guild.id) else "**Desactivado**",
             inline=True
         )
         
@@ -487,32 +1602,105 @@ class Security(commands.Cog):
         
         embed.add_field(
             name="🔧 Funciones Activas",
-            value="• Anti-raid automático\n• Detección de bots\n• Anti-mention spam\n• Protección de enlaces",
+            value="• Anti-raid automático\n• Detección de bots\n• Anti-mention spam\n• Protección de enlaces\n• Anti-flood de mensajes duplicados\n• Anti-nuke\n• Verificación por captcha\n• Filtro de invitaciones externas",
             inline=False
         )
         
         await ctx.send(embed=embed)
 
+    @commands.hybrid_command(name='verification_setup', description='Configurar la verificación por captcha de cuentas sospechosas')
+    @commands.has_permissions(administrator=True)
+    async def verification_setup(self, ctx):
+        """Crear el rol restringido, el canal de verificación y el panel"""
+        guild = ctx.guild
+        status = await ctx.send("⚙️ Configurando verificación por captcha...")
+
+        role = self.get_verification_role(guild)
+        if not role:
+            role = await guild.create_role(
+                name=config.CAPTCHA_ROLE_NAME,
+                permissions=discord.Permissions.none(),
+                reason="Rol de verificación por captcha"
+            )
+
+        channel = discord.utils.get(guild.text_channels, name=config.CAPTCHA_CHANNEL_NAME)
+        if not channel:
+            channel = await guild.create_text_channel(
+                config.CAPTCHA_CHANNEL_NAME,
+                overwrites={
+                    guild.default_role: discord.PermissionOverwrite(view_channel=False),
+                    role: discord.PermissionOverwrite(view_channel=True, send_messages=False, read_message_history=True),
+                    guild.me: discord.PermissionOverwrite(view_channel=True, send_messages=True)
+                },
+                reason="Canal de verificación por captcha"
+            )
+
+        # Ocultar el resto de canales al rol restringido
+        jobs = []
+        for target in guild.channels:
+            if target == channel or target.overwrites_for(role).view_channel is False:
+                continue
+            overwrite = target.overwrites_for(role)
+            overwrite.view_channel = False
+            jobs.append((
+                ('channel_permissions', target.id),
+                functools.partial(target.set_permissions, role, overwrite=overwrite, reason="Verificación por captcha")
+            ))
+        results = await self.lockdown_executor.map(jobs)
+        failed = sum(1 for result in results if isinstance(result, Exception))
+
+        embed = discord.Embed(
+            title="🔒 Verificación",
+            description="Tu cuenta necesita verificarse antes de acceder al servidor.\n"
+                        "Pulsa el botón y escribe los caracteres que aparecen en la imagen.",
+            color=discord.Color.green()
+        )
+        await channel.send(embed=embed, view=VerificationPanelView())
+
+        await status.edit(content=(
+            f"✅ Verificación configurada: {role.mention} en {channel.mention}\n"
+            f"**Canales restringidos:** {len(jobs) - failed}" + (f" (❌ {failed} fallidos)" if failed else "")
+        ))
+
     @commands.hybrid_command(name='scan_members', description='Escanear miembros recientes en busca de cuentas sospechosas')
     @commands.has_permissions(administrator=True)
     async def scan_members(self, ctx, hours: int = 24):
         """Escanear miembros recientes"""
         scan_msg = await ctx.send("🔍 Escaneando miembros recientes...")
         
-        cutoff_time = datetime.now(timezone.utc) - timedelta(hours=hours)
-        suspicious_count = 0
+        now = datetime.now(timezone.utc)
+        cutoff_time = now - timedelta(hours=hours)
+        members = [m for m in ctx.guild.members if m.joined_at and m.joined_at > cutoff_time]
         
         async with ctx.typing():
-            for member in ctx.guild.members:
-                if member.joined_at and member.joined_at > cutoff_time:
-                    is_suspicious, reasons = await self.check_suspicious_account(member)
-                    if is_suspicious:
-                        suspicious_count += 1
+            # Extraer features en una sola pasada, informando del progreso
+            features = None
+            last_update = time.monotonic()
+            async for features, done in self.extract_scan_features(members):
+                if time.monotonic() - last_update > 1.5:
+                    last_update = time.monotonic()
+                    await scan_msg.edit(content=f"🔍 Escaneando miembros recientes... {done}/{len(members)}")
+            
+            scores, signals, cluster = self.score_scan_features(features, now.timestamp())
+            suspicious = np.flatnonzero(scores >= 2)
+            suspicious = suspicious[np.argsort(-scores[suspicious], kind='stable')]
+            
+            rows = []
+            for i in suspicious.tolist():
+                member = members[i]
+                rows.append({
+                    'member': member,
+                    'score': int(scores[i]),
+                    'age_days': int((now.timestamp() - features['created'][i]) // 86400),
+                    'cluster': int(cluster[i]),
+                    'reasons': [label for label, hit in zip(SCAN_SIGNALS, signals[:, i]) if hit]
+                })
+            suspicious_count = len(rows)
             
             embed = discord.Embed(
                 title="🔍 Escaneo de Miembros Completado",
                 description=f"**Período:** Últimas {hours} horas\n"
-                          f"**Miembros escaneados:** {len([m for m in ctx.guild.members if m.joined_at and m.joined_at > cutoff_time])}\n"
+                          f"**Miembros escaneados:** {len(members)}\n"
                           f"**Cuentas sospechosas:** {suspicious_count}",
                 color=discord.Color.orange() if suspicious_count > 0 else discord.Color.green(),
                 timestamp=datetime.now(timezone.utc)
@@ -527,7 +1715,251 @@ class Security(commands.Cog):
                 )
         
         await scan_msg.delete()
-        await ctx.send(embed=embed)
+        
+        if not rows:
+            await ctx.send(embed=embed)
+            return
+        
+        view = ScanResultsView(ctx.author.id, embed, rows)
+        await ctx.send(embeds=view.build_embeds(), view=view, file=self.build_scan_csv(rows))
+
+    async def extract_scan_features(self, members, chunk_size=5000):
+        """Extraer las features de riesgo en arrays NumPy, cediendo el loop cada bloque"""
+        n = len(members)
+        features = {
+            'created': np.empty(n),
+            'joined': np.empty(n),
+            'has_avatar': np.empty(n, dtype=bool),
+            'name_length': np.empty(n, dtype=np.int32),
+            'entropy': np.empty(n, dtype=np.float32),
+            'digit_ratio': np.empty(n, dtype=np.float32),
+            'malicious': np.empty(n, dtype=bool),
+            'many_numbers': np.empty(n, dtype=bool),
+            'generic': np.empty(n, dtype=bool),
+        }
+        
+        for i, member in enumerate(members):
+            name = member.display_name
+            lower = name.lower()
+            length = len(name) or 1
+            
+            features['created'][i] = member.created_at.timestamp()
+            features['joined'][i] = member.joined_at.timestamp()
+            features['has_avatar'][i] = member.avatar is not None
+            features['name_length'][i] = len(name)
+            features['entropy'][i] = -sum(c / length * math.log2(c / length) for c in Counter(name).values())
+            features['digit_ratio'][i] = sum(c.isdigit() for c in name) / length
+            features['malicious'][i] = self.malicious_name_re.search(lower) is not None
+            features['many_numbers'][i] = self.number_name_re.search(name) is not None
+            features['generic'][i] = self.generic_name_re.match(lower) is not None
+            
+            if (i + 1) % chunk_size == 0:
+                yield features, i + 1
+                await asyncio.sleep(0)
+        
+        yield features, n
+
+    def score_scan_features(self, features, now):
+        """Puntuar todos los miembros a la vez; devuelve (puntuación, señales, tamaño de ráfaga)"""
+        age_days = (now - features['created']) / 86400
+        
+        # Miembros que entraron a menos de 60 segundos de cada uno
+        joined = features['joined']
+        ordered = np.sort(joined)
+        cluster = (np.searchsorted(ordered, joined + 60, side='right')
+                   - np.searchsorted(ordered, joined - 60, side='left') - 1)
+        
+        # Mismo orden que SCAN_SIGNALS
+        signals = np.stack([
+            age_days < 2,
+            ~features['has_avatar'],
+            features['malicious'],
+            features['many_numbers'],
+            features['generic'] | (features['digit_ratio'] > 0.4),
+            (features['entropy'] >= 3.3) & (features['name_length'] >= 10),
+            cluster >= 5,
+        ])
+        return signals.sum(axis=0), signals, cluster
+
+    def build_scan_csv(self, rows):
+        """Exportar el resultado del escaneo a CSV"""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(['id', 'nombre', 'puntuacion', 'edad_dias', 'joins_cercanos', 'senales'])
+        for row in rows:
+            member = row['member']
+            writer.writerow([member.id, member.display_name, row['score'], row['age_days'],
+                             row['cluster'], '; '.join(row['reasons'])])
+        return discord.File(io.BytesIO(buffer.getvalue().encode('utf-8')), filename='escaneo_miembros.csv')
+
+    @commands.hybrid_command(name='raid_cleanup', description='Expulsar, banear o aislar en bloque a quienes entraron en una ventana de tiempo')
+    @commands.has_permissions(administrator=True)
+    async def raid_cleanup(self, ctx, accion: str, desde_minutos: int, hasta_minutos: int = 0,
+                           puntuacion_minima: int = 0, grupo_nombres: bool = False, invitacion: str = None):
+        """Limpieza masiva tras un raid: kick, ban o timeout con filtros"""
+        accion = accion.lower()
+        if accion not in CLEANUP_ACTIONS:
+            await ctx.send(f"❌ Acción inválida. Acciones disponibles: {', '.join(CLEANUP_ACTIONS)}", ephemeral=True)
+            return
+        
+        now = datetime.now(timezone.utc)
+        start = now - timedelta(minutes=desde_minutos)
+        end = now - timedelta(minutes=hasta_minutos)
+        targets = await self.select_cleanup_targets(ctx.guild, start, end, puntuacion_minima, grupo_nombres, invitacion)
+        
+        if not targets:
+            await ctx.send("✅ Ningún miembro coincide con esos filtros.", ephemeral=True)
+            return
+        
+        filters = [f"**Ventana:** <t:{int(start.timestamp())}:t> → <t:{int(end.timestamp())}:t>"]
+        if puntuacion_minima:
+            filters.append(f"**Puntuación mínima:** {puntuacion_minima}")
+        if grupo_nombres:
+            filters.append("**Solo grupos de nombres similares**")
+        if invitacion:
+            filters.append(f"**Invitación:** `{invitacion}`")
+        
+        embed = discord.Embed(
+            title=f"🧹 Limpieza de Raid: {CLEANUP_ACTIONS[accion]}",
+            description="\n".join(filters) + f"\n\n**Miembros afectados:** {len(targets)}",
+            color=discord.Color.orange()
+        )
+        embed.add_field(
+            name="👥 Muestra",
+            value=", ".join(member.mention for member in targets[:20]) + (" ..." if len(targets) > 20 else ""),
+            inline=False
+        )
+        
+        view = CleanupConfirmView(ctx.author.id)
+        status = await ctx.send(embed=embed, view=view)
+        await view.wait()
+        if not view.confirmed:
+            return
+        
+        job_id = f"{ctx.guild.id}-{int(time.time())}"
+        self.cleanup_jobs[job_id] = {
+            'guild_id': ctx.guild.id,
+            'channel_id': ctx.channel.id,
+            'message_id': status.id,
+            'action': accion,
+            'requested_by': ctx.author.id,
+            'total': len(targets),
+            'done': 0,
+            'failed': 0,
+            'pending': [member.id for member in targets]
+        }
+        self.save_cleanup_jobs()
+        self.cleanup_tasks[job_id] = asyncio.create_task(self.run_cleanup_job(job_id))
+
+    async def select_cleanup_targets(self, guild, start, end, min_score=0, name_cluster=False, invite_code=None):
+        """Miembros que entraron en la ventana y cumplen los filtros (sin staff ni bots)"""
+        members = [
+            m for m in guild.members
+            if m.joined_at and start <= m.joined_at <= end
+            and not m.bot
+            and m.id != guild.owner_id
+            and not m.guild_permissions.manage_messages
+            and m.top_role < guild.me.top_role
+        ]
+        
+        if name_cluster:
+            members = [m for m in members if (guild.id, m.id) in self.name_cluster_members]
+        
+        if invite_code:
+            members = [m for m in members
+                       if self.invite_tracker.attributions.get((guild.id, m.id)) == invite_code]
+        
+        if min_score and members:
+            features = None
+            async for features, _ in self.extract_scan_features(members):
+                pass
+            scores, _, _ = self.score_scan_features(features, time.time())
+            members = [m for m, score in zip(members, scores.tolist()) if score >= min_score]
+        
+        return members
+
+    async def run_cleanup_job(self, job_id):
+        """Ejecutar (o reanudar) una limpieza por bloques, guardando el progreso tras cada uno"""
+        await self.bot.wait_until_ready()
+        job = self.cleanup_jobs[job_id]
+        guild = self.bot.get_guild(job['guild_id'])
+        if not guild:
+            self.cleanup_jobs.pop(job_id, None)
+            self.save_cleanup_jobs()
+            return
+        
+        channel = guild.get_channel(job['channel_id'])
+        status = channel.get_partial_message(job['message_id']) if channel else None
+        action_name = CLEANUP_ACTIONS[job['action']]
+        
+        while job['pending']:
+            chunk = job['pending'][:CLEANUP_CHUNK]
+            done, failed = await self.execute_cleanup_chunk(guild, job['action'], chunk)
+            job['done'] += done
+            job['failed'] += failed
+            del job['pending'][:len(chunk)]
+            self.save_cleanup_jobs()
+            
+            if status:
+                processed = job['done'] + job['failed']
+                try:
+                    await status.edit(content=f"🧹 {action_name}: {processed}/{job['total']} procesados "
+                                             f"({job['failed']} errores)")
+                except discord.HTTPException:
+                    pass
+        
+        self.cleanup_jobs.pop(job_id, None)
+        self.cleanup_tasks.pop(job_id, None)
+        self.save_cleanup_jobs()
+        
+        if status:
+            try:
+                await status.edit(content=f"✅ Limpieza completada: {job['done']} miembros ({action_name.lower()}), "
+                                         f"{job['failed']} errores")
+            except discord.HTTPException:
+                pass
+        
+        await self.log_security_incident(
+            guild,
+            "🧹 Limpieza de Raid Completada",
+            f"**Acción:** {action_name}\n"
+            f"**Solicitada por:** <@{job['requested_by']}>\n"
+            f"**Completados:** {job['done']}\n"
+            f"**Errores:** {job['failed']}",
+            discord.Color.blue()
+        )
+
+    async def execute_cleanup_chunk(self, guild, action, member_ids):
+        """Aplicar la acción a un bloque de miembros; devuelve (completados, fallidos)"""
+        reason = f"Limpieza de raid: {CLEANUP_ACTIONS[action].lower()}"
+        
+        # Baneo en bloque con una sola petición si la versión de discord.py lo permite
+        if action == 'ban' and hasattr(guild, 'bulk_ban'):
+            try:
+                result = await guild.bulk_ban([discord.Object(id=member_id) for member_id in member_ids],
+                                              reason=reason, delete_message_seconds=3600)
+                return len(result.banned), len(result.failed)
+            except discord.HTTPException:
+                pass
+        
+        jobs = []
+        for member_id in member_ids:
+            if action == 'ban':
+                factory = functools.partial(guild.ban, discord.Object(id=member_id), reason=reason, delete_message_seconds=3600)
+            else:
+                member = guild.get_member(member_id)
+                if not member:
+                    continue  # Ya no está en el servidor: cuenta como completado
+                if action == 'kick':
+                    factory = functools.partial(member.kick, reason=reason)
+                else:
+                    factory = functools.partial(member.timeout, timedelta(hours=config.QUARANTINE_TIMEOUT_HOURS), reason=reason)
+            jobs.append(((action, guild.id), factory))
+        
+        results = await self.cleanup_executor.map(jobs)
+        failed = sum(1 for result in results
+                     if isinstance(result, Exception) and not isinstance(result, discord.NotFound))
+        return len(member_ids) - failed, failed
 
 async def setup(bot):
     await bot.add_cog(Security(bot))
\ No newline at end of file
@@ -0,0 +1,226 @@
+import re
+import zlib
+import random
+import hashlib
+import unicodedata
+from collections import deque
+
+# Bits de la huella SimHash y división en bandas para LSH.
+# Con 8 bandas de 8 bits, dos huellas a distancia de Hamming <= 7
+# comparten al menos una banda exacta (principio del palomar).
+SIMHASH_BITS = 64
+SIMHASH_BANDS = 8
+SIMHASH_MAX_DISTANCE = SIMHASH_BANDS - 1
+_BAND_WIDTH = SIMHASH_BITS // SIMHASH_BANDS
+_BAND_MASK = (1 << _BAND_WIDTH) - 1
+
+# MinHash de nombres: 16 permutaciones en 8 bandas de 2 filas
+MINHASH_PERMUTATIONS = 16
+MINHASH_ROWS = 2
+_MERSENNE_PRIME = (1 << 61) - 1
+_rng = random.Random(0x5EED)
+_PERMUTATIONS = [(_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME))
+                 for _ in range(MINHASH_PERMUTATIONS)]
+
+_LEET = str.maketrans('013457@$!|', 'oieastasii')
+_DIGIT_RUN_RE = re.compile(r'\d{2,}')
+_NAME_JUNK_RE = re.compile(r'[^a-z#]+')
+
+_MENTION_RE = re.compile(r'<(?:@[!&]?|#|a?:\w+:)\d+>')
+_NON_WORD_RE = re.compile(r'[^\w\s]+')
+_SPACES_RE = re.compile(r'\s+')
+
+
+def normalize_text(text):
+    """Normalizar texto: minúsculas, sin acentos, menciones ni signos"""
+    text = unicodedata.normalize('NFKD', text.lower())
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    text = _MENTION_RE.sub(' ', text)
+    text = _NON_WORD_RE.sub(' ', text)
+    return _SPACES_RE.sub(' ', text).strip()
+
+
+def normalize_name(name):
+    """Normalizar un nombre de usuario: shad0w_5531 y shadow_1234 quedan iguales"""
+    name = unicodedata.normalize('NFKD', name.lower())
+    name = ''.join(c for c in name if not unicodedata.combining(c))
+    name = _DIGIT_RUN_RE.sub('#', name)   # Los sufijos numéricos suelen ser aleatorios
+    name = name.translate(_LEET)          # Dígitos sueltos dentro del nombre: leetspeak
+    return _NAME_JUNK_RE.sub('', name)
+
+
+def name_minhash(name, ngram=3):
+    """Firma MinHash de los n-gramas de caracteres de un nombre ya normalizado"""
+    padded = f'^{name}$'
+    shingles = {zlib.crc32(padded[i:i + ngram].encode()) for i in range(max(1, len(padded) - ngram + 1))}
+    return tuple(min((a * x + b) % _MERSENNE_PRIME for x in shingles) for a, b in _PERMUTATIONS)
+
+
+def minhash_bands(signature):
+    """Claves LSH (banda, filas) de una firma MinHash"""
+    return [(i, signature[i:i + MINHASH_ROWS]) for i in range(0, len(signature), MINHASH_ROWS)]
+
+
+def minhash_similarity(a, b):
+    """Similitud de Jaccard estimada entre dos firmas MinHash"""
+    return sum(x == y for x, y in zip(a, b)) / len(a)
+
+
+def _hash64(feature):
+    return int.from_bytes(hashlib.blake2b(feature.encode(), digest_size=8).digest(), 'big')
+
+
+def simhash(text, ngram=4, max_features=128):
+    """Calcular la huella SimHash de 64 bits de un texto ya normalizado"""
+    if len(text) <= ngram:
+        features = {text}
+    else:
+        features = {text[i:i + ngram] for i in range(len(text) - ngram + 1)}
+    hashes = [_hash64(f) for f in list(features)[:max_features]]
+
+    # Contadores por bit en forma "bit-sliced": planes[k] guarda el bit k
+    # del contador de cada una de las 64 posiciones, así sumar un hash
+    # cuesta O(log n) operaciones en lugar de 64.
+    planes = []
+    for carry in hashes:
+        for k in range(len(planes)):
+            if not carry:
+                break
+            planes[k], carry = planes[k] ^ carry, planes[k] & carry
+        if carry:
+            planes.append(carry)
+
+    # Bit de salida = 1 donde el contador supera la mitad de las features
+    threshold = len(hashes) // 2
+    full = (1 << SIMHASH_BITS) - 1
+    greater, equal = 0, full
+    for k in range(len(planes) - 1, -1, -1):
+        if (threshold >> k) & 1:
+            equal &= planes[k]
+        else:
+            greater |= equal & planes[k]
+            equal &= ~planes[k] & full
+    return greater
+
+
+def simhash_bands(fingerprint):
+    """Claves LSH (banda, valor) de una huella SimHash"""
+    return [(i, (fingerprint >> (i * _BAND_WIDTH)) & _BAND_MASK) for i in range(SIMHASH_BANDS)]
+
+
+def hamming(a, b):
+    """Distancia de Hamming entre dos enteros"""
+    return bin(a ^ b).count('1')
+
+
+class WindowedLSHIndex:
+    """Índice LSH con ventana de tiempo: cada cubeta guarda solo entradas recientes"""
+
+    def __init__(self, window, max_bucket=64):
+        self.window = window
+        self.max_bucket = max_bucket
+        self._buckets = {}
+        self._timeline = deque()
+
+    def __len__(self):
+        return len(self._timeline)
+
+    def purge(self, now):
+        """Eliminar entradas fuera de la ventana (amortizado O(1))"""
+        cutoff = now - self.window
+        while self._timeline and self._timeline[0][0] < cutoff:
+            _, keys, entry = self._timeline.popleft()
+            for key in keys:
+                bucket = self._buckets.get(key)
+                if bucket and bucket[0] is entry:
+                    bucket.popleft()
+                if bucket is not None and not bucket:
+                    del self._buckets[key]
+
+    def query(self, keys, now):
+        """Entradas recientes que comparten al menos una clave, sin duplicados"""
+        self.purge(now)
+        seen = set()
+        for key in keys:
+            for entry in self._buckets.get(key, ()):
+                if id(entry) not in seen:
+                    seen.add(id(entry))
+                    yield entry
+
+    def add(self, keys, entry, now):
+        """Indexar una entrada bajo sus claves LSH"""
+        self.purge(now)
+        keys = tuple(keys)
+        for key in keys:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = deque(maxlen=self.max_bucket)
+            bucket.append(entry)
+        self._timeline.append((now, keys, entry))
+
+
+class BKTree:
+    """Árbol BK: búsqueda de hashes cercanos por distancia de Hamming sin recorrerlos todos"""
+
+    def __init__(self):
+        self.root = None
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def add(self, key, item):
+        node = (key, item, {})
+        self.size += 1
+        if self.root is None:
+            self.root = node
+            return
+        current = self.root
+        while True:
+            distance = hamming(key, current[0])
+            child = current[2].get(distance)
+            if child is None:
+                current[2][distance] = node
+                return
+            current = child
+
+    def search(self, key, radius):
+        """Elementos a distancia <= radius, como lista de (distancia, item)"""
+        results = []
+        stack = [self.root] if self.root else []
+        while stack:
+            node_key, item, children = stack.pop()
+            distance = hamming(key, node_key)
+            if distance <= radius:
+                results.append((distance, item))
+            # Desigualdad triangular: solo pueden estar en estas ramas
+            for child_distance, child in children.items():
+                if distance - radius <= child_distance <= distance + radius:
+                    stack.append(child)
+        return results
+
+
+class WindowedBKTree:
+    """Árboles BK por generaciones: se descarta un árbol entero cuando sale de la ventana"""
+
+    def __init__(self, window):
+        self.window = window
+        self.generations = deque()  # (inicio, BKTree)
+
+    def _rotate(self, now):
+        while self.generations and self.generations[0][0] < now - 2 * self.window:
+            self.generations.popleft()
+        if not self.generations or now - self.generations[-1][0] >= self.window:
+            self.generations.append((now, BKTree()))
+
+    def add(self, key, item, now):
+        self._rotate(now)
+        self.generations[-1][1].add(key, (now, item))
+
+    def search(self, key, radius, now):
+        """Elementos cercanos añadidos dentro de la ventana"""
+        self._rotate(now)
+        cutoff = now - self.window
+        return [item for _, tree in self.generations
+                for _, (added, item) in tree.search(key, radius)
+                if added >= cutoff]
@@ -0,0 +1,61 @@
+import re
+from functools import lru_cache
+
+# Variables permitidas en los mensajes de bienvenida: nada de recorrer atributos arbitrarios
+PLACEHOLDERS = {
+    'member.mention': lambda member: member.mention,
+    'member.name': lambda member: member.name,
+    'member.display_name': lambda member: member.display_name,
+    'member.id': lambda member: str(member.id),
+    'guild.name': lambda member: member.guild.name,
+    'guild.id': lambda member: str(member.guild.id),
+    'member_count': lambda member: str(member.guild.member_count),
+}
+
+_TOKEN_RE = re.compile(r'\{\{|\}\}|\{([^{}]*)\}|[{}]')
+
+
+class TemplateError(ValueError):
+    """Plantilla con llaves desparejadas o variables no permitidas"""
+
+
+@lru_cache(maxsize=256)
+def compile_template(text):
+    """Analizar una plantilla una sola vez: tupla de textos literales y funciones de variables"""
+    segments = []
+    literal = []
+    position = 0
+
+    for match in _TOKEN_RE.finditer(text):
+        literal.append(text[position:match.start()])
+        position = match.end()
+        token = match.group(0)
+
+        if token in ('{{', '}}'):
+            literal.append(token[0])  # Llave escapada
+        elif match.group(1) is None:
+            raise TemplateError(f"Llave '{token}' desparejada en la posición {match.start()}")
+        else:
+            name = match.group(1).strip()
+            if name not in PLACEHOLDERS:
+                raise TemplateError(f"Variable no permitida: {{{name}}}")
+            if literal:
+                segments.append(''.join(literal))
+                literal = []
+            segments.append(PLACEHOLDERS[name])
+
+    literal.append(text[position:])
+    if ''.join(literal):
+        segments.append(''.join(literal))
+    return tuple(segments)
+
+
+def render_template(text, member):
+    """Rellenar una plantilla ya validada para un miembro"""
+    return ''.join(segment if isinstance(segment, str) else segment(member)
+                   for segment in compile_template(text))
+
+
+def placeholder_help():
+    """Lista de variables disponibles para mostrar en los comandos"""
+    return ', '.join(f'`{{{name}}}`' for name in PLACEHOLDERS)
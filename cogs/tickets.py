@@ -4,7 +4,7 @@ from discord import ui
 import asyncio
 from datetime import datetime
 import config
-from .checks import has_admin_role
+from .checks import has_admin_role, get_config_role
 import random
 
 class TicketView(ui.View):
@@ -85,7 +85,7 @@ class ProblemSelect(discord.ui.Select):
                 }
                 
                 # Agregar rol admin si existe
-                admin_role = guild.get_role(config.ROLES["ADMIN"])
+                admin_role = get_config_role(guild, "ADMIN")
                 if admin_role:
                     overwrites[admin_role] = discord.PermissionOverwrite(
                         read_messages=True, 
@@ -139,7 +139,7 @@ class ProblemSelect(discord.ui.Select):
         }
         
         # Agregar rol de admin
-        admin_role = guild.get_role(config.ROLES["ADMIN"])
+        admin_role = get_config_role(guild, "ADMIN")
         if admin_role:
             overwrites[admin_role] = discord.PermissionOverwrite(read_messages=True, send_messages=True, manage_messages=True)
         
@@ -226,7 +226,7 @@ class ProblemSelect(discord.ui.Select):
             member: discord.PermissionOverwrite(read_messages=True, send_messages=True)
         }
         
-        admin_role = guild.get_role(config.ROLES["ADMIN"])
+        admin_role = get_config_role(guild, "ADMIN")
         if admin_role:
             overwrites[admin_role] = discord.PermissionOverwrite(read_messages=True, send_messages=True, manage_messages=True)
         
@@ -279,7 +279,7 @@ class TicketCloseView(ui.View):
     @discord.ui.button(label='Cerrar Ticket', style=discord.ButtonStyle.danger, emoji='🔒', custom_id='close_ticket')
     async def close_ticket(self, interaction: discord.Interaction, button: discord.ui.Button):
         # Verificar permisos por rol
-        admin_role = interaction.guild.get_role(config.ROLES["ADMIN"])
+        admin_role = get_config_role(interaction.guild, "ADMIN")
         if not (interaction.user.guild_permissions.administrator or 
                 (admin_role and admin_role in interaction.user.roles)):
             await interaction.response.send_message("❌ No tienes permisos para cerrar tickets.", ephemeral=True)
@@ -414,7 +414,7 @@ class Tickets(commands.Cog):
             # Marcar este ticket como desactivado para IA
             self.ia_disabled_tickets.add(channel_id)
             
-            admin_role = message.guild.get_role(config.ROLES["ADMIN"])
+            admin_role = get_config_role(message.guild, "ADMIN")
             if admin_role:
                 embed = discord.Embed(
                     title="📞 SOLICITUD DE ADMINISTRADOR",
@@ -488,7 +488,7 @@ class Tickets(commands.Cog):
         # Desactivar IA para este ticket
         self.ia_disabled_tickets.add(ctx.channel.id)
         
-        admin_role = ctx.guild.get_role(config.ROLES["ADMIN"])
+        admin_role = get_config_role(ctx.guild, "ADMIN")
         if admin_role:
             embed = discord.Embed(
                 title="📞 SOLICITUD DE ADMINISTRADOR",
@@ -548,7 +548,7 @@ class Tickets(commands.Cog):
                 }
                 
                 # Agregar rol admin si existe
-                admin_role = ctx.guild.get_role(config.ROLES["ADMIN"])
+                admin_role = get_config_role(ctx.guild, "ADMIN")
                 if admin_role:
                     overwrites[admin_role] = discord.PermissionOverwrite(
                         read_messages=True, 
@@ -0,0 +1,84 @@
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """Caché con caducidad fija: diccionario ordenado por inserción que expira desde la cabeza.
+
+    Con lru=True cada lectura mueve la clave al final, de modo que al superar
+    maxsize se descarta la menos usada; las entradas caducadas que queden detrás
+    de una reciente se eliminan al leerlas o al desalojarlas.
+    """
+
+    def __init__(self, ttl, maxsize=None, lru=False):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.lru = lru
+        self._data = OrderedDict()  # clave -> (caduca, valor)
+
+    def __len__(self):
+        self.expire()
+        return len(self._data)
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def expire(self, now=None):
+        """Eliminar las entradas caducadas (amortizado O(1) por inserción)"""
+        now = time.monotonic() if now is None else now
+        data = self._data
+        while data:
+            key = next(iter(data))
+            if data[key][0] > now:
+                break
+            data.popitem(last=False)
+
+    def get(self, key, default=None):
+        item = self._data.get(key)
+        if item is None:
+            return default
+        if item[0] <= time.monotonic():
+            del self._data[key]
+            self.expire()
+            return default
+        if self.lru:
+            self._data.move_to_end(key)
+        return item[1]
+
+    def set(self, key, value):
+        """Guardar un valor; reinsertar una clave la mueve al final y renueva su TTL"""
+        now = time.monotonic()
+        self.expire(now)
+        self._data.pop(key, None)
+        self._data[key] = (now + self.ttl, value)
+        if self.maxsize is not None and len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        item = self._data.pop(key, None)
+        if item is None or item[0] <= time.monotonic():
+            return default
+        return item[1]
+
+    def clear(self):
+        self._data.clear()
+
+
+class TTLDedupe:
+    """Conjunto con caducidad para descartar eventos repetidos (joins duplicados, reenvíos del gateway)"""
+
+    def __init__(self, ttl, maxsize=None):
+        self._seen = TTLCache(ttl, maxsize)
+
+    def __len__(self):
+        return len(self._seen)
+
+    def seen(self, key):
+        """True si la clave ya se vio dentro del TTL; si no, la registra y devuelve False"""
+        if key in self._seen:
+            return True
+        self._seen.set(key, True)
+        return False
+
+
+_MISSING = object()
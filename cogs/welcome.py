@@ -1,61 +1,50 @@
 import discord
 from discord.ext import commands
 from discord import app_commands
-import json
-import os
 import aiohttp
+import asyncio
+import io
 import time
+from collections import deque
+from .imaging import get_image_pool, render_welcome_card
+from .assetcache import get_asset_cache
+from .ttlcache import TTLDedupe
+from .guildconfig import get_guild_config
+from .templates import compile_template, render_template, placeholder_help, TemplateError
+
+# Cola de bienvenidas por servidor
+WELCOME_MIN_INTERVAL = 3      # Segundos mínimos entre mensajes en el mismo canal
+WELCOME_BATCH_THRESHOLD = 3   # Miembros en cola a partir de los cuales se saluda en grupo
+WELCOME_BATCH_DELAY = 5       # Segundos esperando a que se acumule la ráfaga
+WELCOME_BATCH_MENTIONS = 10   # Menciones máximas en un saludo de grupo
+DEFAULT_WELCOME_MESSAGE = '¡Bienvenido {member.mention} al servidor!'
 
 class Welcome(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.welcome_data = self.load_welcome_data()
-        self.processed_members = {}  # Diccionario para evitar duplicados
-    
-    def load_welcome_data(self):
-        """Carga la configuración de bienvenidas desde un archivo JSON"""
-        try:
-            with open('data/welcome_config.json', 'r') as f:
-                return json.load(f)
-        except FileNotFoundError:
-            # Crear estructura por defecto si el archivo no existe
-            default_data = {}
-            os.makedirs('data', exist_ok=True)
-            with open('data/welcome_config.json', 'w') as f:
-                json.dump(default_data, f, indent=4)
-            return default_data
+        self.settings = get_guild_config(bot)  # Sección 'welcome' de la configuración por servidor
+        self.processed_members = TTLDedupe(ttl=30, maxsize=10000)  # Evitar bienvenidas duplicadas
+        self.welcome_queues = {}     # guild_id -> deque de miembros pendientes de saludar
+        self.welcome_tasks = {}
+        self.channel_last_sent = {}  # channel_id -> último envío (monotonic)
     
-    def save_welcome_data(self):
-        """Guarda la configuración de bienvenidas en un archivo JSON"""
-        with open('data/welcome_config.json', 'w') as f:
-            json.dump(self.welcome_data, f, indent=4)
+    def get_welcome_config(self, guild_id):
+        """Configuración de bienvenidas del servidor (vacía si no se configuró)"""
+        return self.settings.section(guild_id, 'welcome')
     
     @commands.Cog.listener()
     async def on_member_join(self, member):
         """Evento que se ejecuta cuando un miembro se une al servidor"""
-        # Verificar si ya procesamos a este miembro recientemente
-        member_key = f"{member.guild.id}_{member.id}"
-        current_time = time.time()
-        
         # Si el miembro ya fue procesado en los últimos 30 segundos, ignorar
-        if member_key in self.processed_members:
-            if current_time - self.processed_members[member_key] < 30:
-                print(f"⚠️ Miembro {member} ya fue procesado recientemente, ignorando...")
-                return
-        
-        # Registrar el procesamiento
-        self.processed_members[member_key] = current_time
-        
-        # Limpiar entradas antiguas (más de 5 minutos)
-        self.clean_processed_members()
-        
-        guild_id = str(member.guild.id)
+        if self.processed_members.seen((member.guild.id, member.id)):
+            print(f"⚠️ Miembro {member} ya fue procesado recientemente, ignorando...")
+            return
         
         # Verificar si hay configuración para este servidor
-        if guild_id not in self.welcome_data:
+        config = self.get_welcome_config(member.guild.id)
+        if not config:
             return
         
-        config = self.welcome_data[guild_id]
         channel_id = config.get('channel_id')
         
         if not channel_id:
@@ -65,36 +54,109 @@ class Welcome(commands.Cog):
         if not channel:
             return
         
+        # Los saludos pasan por la cola del servidor para no saturar el canal
+        self.enqueue_welcome(member)
+    
+    def enqueue_welcome(self, member):
+        """Añadir un miembro a la cola de bienvenidas de su servidor"""
+        guild_id = member.guild.id
+        queue = self.welcome_queues.get(guild_id)
+        if queue is None:
+            queue = self.welcome_queues[guild_id] = deque()
+        queue.append(member)
+        
+        task = self.welcome_tasks.get(guild_id)
+        if task is None or task.done():
+            self.welcome_tasks[guild_id] = asyncio.create_task(self.process_welcome_queue(member.guild))
+    
+    def is_raid_active(self, guild_id):
+        """Consultar al cog de seguridad si el servidor está en modo raid"""
+        security = self.bot.get_cog('Security')
+        return bool(security and security.is_raid_active(guild_id))
+    
+    async def process_welcome_queue(self, guild):
+        """Saludar a los miembros en cola: uno a uno a ritmo normal, en grupo durante una ráfaga"""
+        queue = self.welcome_queues[guild.id]
+        while queue:
+            config = self.get_welcome_config(guild.id)
+            channel = self.bot.get_channel(config.get('channel_id'))
+            if not channel:
+                queue.clear()
+                break
+            
+            # Como mucho un mensaje cada WELCOME_MIN_INTERVAL segundos por canal
+            wait = self.channel_last_sent.get(channel.id, 0) + WELCOME_MIN_INTERVAL - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            
+            if len(queue) >= WELCOME_BATCH_THRESHOLD:
+                # Ráfaga de joins: esperar un poco más y saludar a todos juntos
+                await asyncio.sleep(WELCOME_BATCH_DELAY)
+            
+            # En modo raid no se saluda a nadie
+            if self.is_raid_active(guild.id):
+                print(f"🚨 Bienvenidas suprimidas en {guild.name} por modo raid ({len(queue)} miembros)")
+                queue.clear()
+                break
+            
+            if len(queue) >= WELCOME_BATCH_THRESHOLD:
+                members = list(queue)
+                queue.clear()
+            else:
+                members = [queue.popleft()]
+            
+            # Quien ya se fue no necesita bienvenida
+            members = [member for member in members if guild.get_member(member.id)]
+            if not members:
+                continue
+            
+            try:
+                if len(members) > 1:
+                    await self.send_batch_welcome(channel, guild, members)
+                    print(f"✅ Bienvenida en grupo enviada para {len(members)} miembros")
+                else:
+                    await self.send_welcome(channel, members[0], config)
+                    print(f"✅ Mensaje de bienvenida enviado para {members[0]}")
+            except Exception as e:
+                print(f"❌ Error enviando bienvenida en {guild.name}: {e}")
+            
+            self.channel_last_sent[channel.id] = time.monotonic()
+    
+    async def send_welcome(self, channel, member, config):
+        """Enviar la bienvenida individual del tipo configurado"""
         # Obtener el mensaje y tipo de bienvenida
-        message = config.get('message', '¡Bienvenido {member.mention} al servidor!')
-        welcome_type = config.get('type', 'embed')  # embed, gif
-        
-        # Reemplazar variables en el mensaje
-        formatted_message = message.format(
-            member=member,
-            guild=member.guild,
-            member_count=member.guild.member_count
-        )
+        message = config.get('message', DEFAULT_WELCOME_MESSAGE)
+        welcome_type = config.get('type', 'embed')  # embed, gif, card
         
+        # Reemplazar variables en el mensaje (la plantilla se analiza una sola vez)
         try:
-            if welcome_type == 'embed':
-                await self.send_embed_welcome(channel, member, formatted_message, config)
-            elif welcome_type == 'gif':
-                await self.send_gif_welcome(channel, member, formatted_message, config)
-            
-            print(f"✅ Mensaje de bienvenida enviado para {member}")
-            
-        except Exception as e:
-            print(f"❌ Error enviando bienvenida para {member}: {e}")
+            formatted_message = render_template(message, member)
+        except TemplateError as e:
+            # Mensajes guardados antes de la validación
+            print(f"⚠️ Mensaje de bienvenida inválido en {member.guild.name}: {e}")
+            formatted_message = render_template(DEFAULT_WELCOME_MESSAGE, member)
+        
+        if welcome_type == 'embed':
+            await self.send_embed_welcome(channel, member, formatted_message, config)
+        elif welcome_type == 'gif':
+            await self.send_gif_welcome(channel, member, formatted_message, config)
+        elif welcome_type == 'card':
+            await self.send_card_welcome(channel, member, formatted_message, config)
     
-    def clean_processed_members(self):
-        """Limpia las entradas antiguas del diccionario de miembros procesados"""
-        current_time = time.time()
-        # Eliminar entradas con más de 5 minutos
-        self.processed_members = {
-            k: v for k, v in self.processed_members.items() 
-            if current_time - v < 300  # 5 minutos
-        }
+    async def send_batch_welcome(self, channel, guild, members):
+        """Saludar a una ráfaga de miembros en un solo mensaje"""
+        mentions = ', '.join(member.mention for member in members[:WELCOME_BATCH_MENTIONS])
+        others = len(members) - WELCOME_BATCH_MENTIONS
+        if others > 0:
+            mentions += f" … y {others} más"
+        
+        embed = discord.Embed(
+            title="¡Bienvenidos/as! 🎉",
+            description=f"¡Bienvenidos {mentions} a **{guild.name}**!",
+            color=discord.Color.green()
+        )
+        embed.set_footer(text=f"Ahora somos {guild.member_count} miembros")
+        await channel.send(embed=embed)
     
     async def send_embed_welcome(self, channel, member, message, config):
         """Envía un mensaje de bienvenida con embed"""
@@ -153,6 +215,45 @@ class Welcome(commands.Cog):
             # Si no hay GIF configurado, usar embed normal
             await self.send_embed_welcome(channel, member, message, config)
     
+    async def send_card_welcome(self, channel, member, message, config):
+        """Envía una tarjeta de bienvenida renderizada con Pillow"""
+        assets = get_asset_cache(self.bot)
+        background = await self.get_card_background(config)
+        
+        try:
+            avatar = await assets.get(member.display_avatar.with_size(256).with_static_format('png').url)
+        except Exception as e:
+            print(f"⚠️ No se pudo obtener el avatar de {member}: {e}")
+            avatar = None
+        
+        # El renderizado va al pool de procesos para no bloquear el gateway
+        card = await asyncio.get_running_loop().run_in_executor(
+            get_image_pool(),
+            render_welcome_card,
+            background,
+            avatar,
+            "¡Bienvenido/a!",
+            member.display_name,
+            f"Miembro #{member.guild.member_count} · {member.guild.name}"
+        )
+        
+        embed = discord.Embed(description=message, color=discord.Color.purple())
+        embed.set_image(url="attachment://bienvenida.png")
+        await channel.send(embed=embed, file=discord.File(io.BytesIO(card), filename="bienvenida.png"))
+    
+    async def get_card_background(self, config):
+        """Ruta en disco del fondo de la tarjeta (None si no hay o no se pudo descargar)"""
+        url = config.get('background_image') or config.get('gif_url')
+        if not url:
+            return None
+        
+        # La ruta depende del contenido: si el fondo cambia, los workers preparan una plantilla nueva
+        try:
+            return await get_asset_cache(self.bot).get_path(url)
+        except Exception as e:
+            print(f"❌ Error descargando el fondo de bienvenida: {e}")
+            return None
+    
     @app_commands.command(name="setwelcome", description="Configura el canal de bienvenidas")
     @app_commands.default_permissions(administrator=True)
     async def set_welcome(self, interaction: discord.Interaction, channel: discord.TextChannel, 
@@ -160,7 +261,7 @@ class Welcome(commands.Cog):
         """Comando para configurar las bienvenidas"""
         
         # Validar el tipo
-        valid_types = ["embed", "gif"]
+        valid_types = ["embed", "gif", "card"]
         if tipo.lower() not in valid_types:
             await interaction.response.send_message(
                 f"❌ Tipo inválido. Tipos disponibles: {', '.join(valid_types)}", 
@@ -168,12 +269,9 @@ class Welcome(commands.Cog):
             )
             return
         
-        guild_id = str(interaction.guild.id)
+        guild_id = interaction.guild.id
         
-        if guild_id not in self.welcome_data:
-            self.welcome_data[guild_id] = {}
-        
-        self.welcome_data[guild_id].update({
+        self.settings.update(guild_id, 'welcome', {
             'channel_id': channel.id,
             'type': tipo.lower(),
             'message': "¡Bienvenido {member.mention} al servidor {guild.name}! 🎉",
@@ -181,22 +279,20 @@ class Welcome(commands.Cog):
             'show_account_age': True
         })
         
-        self.save_welcome_data()
-        
         embed = discord.Embed(
             title="✅ Configuración de bienvenidas actualizada",
             color=discord.Color.green()
         )
         embed.add_field(name="Canal", value=channel.mention, inline=True)
         embed.add_field(name="Tipo", value=tipo, inline=True)
-        embed.add_field(name="Mensaje por defecto", value=self.welcome_data[guild_id]['message'], inline=False)
+        embed.add_field(name="Mensaje por defecto", value=self.get_welcome_config(guild_id)['message'], inline=False)
         
         await interaction.response.send_message(embed=embed)
     
     @set_welcome.autocomplete('tipo')
     async def set_welcome_autocomplete(self, interaction: discord.Interaction, current: str):
         """Autocomplete para los tipos de bienvenida"""
-        tipos = ["embed", "gif"]
+        tipos = ["embed", "gif", "card"]
         choices = [
             app_commands.Choice(name=tipo, value=tipo)
             for tipo in tipos if current.lower() in tipo.lower()
@@ -207,28 +303,26 @@ class Welcome(commands.Cog):
     @app_commands.default_permissions(administrator=True)
     async def set_welcome_message(self, interaction: discord.Interaction, mensaje: str):
         """Configura un mensaje personalizado para las bienvenidas"""
-        guild_id = str(interaction.guild.id)
+        guild_id = interaction.guild.id
         
-        if guild_id not in self.welcome_data:
+        if not self.get_welcome_config(guild_id):
             await interaction.response.send_message("❌ Primero configura el canal de bienvenidas con `/setwelcome`", ephemeral=True)
             return
         
-        # Validar que el mensaje tenga las variables necesarias
-        if "{member.mention}" not in mensaje:
+        # Validar la plantilla una sola vez, al guardarla
+        try:
+            compile_template(mensaje)
+        except TemplateError as e:
             await interaction.response.send_message(
-                "⚠️ Recomendado: Incluye `{member.mention}` en el mensaje para mencionar al usuario",
+                f"❌ Mensaje inválido: {e}\nVariables disponibles: {placeholder_help()}\nUsa `{{{{` y `}}}}` para escribir llaves.",
                 ephemeral=True
             )
+            return
         
-        self.welcome_data[guild_id]['message'] = mensaje
-        self.save_welcome_data()
+        self.settings.set(guild_id, 'welcome', 'message', mensaje)
         
         # Mostrar cómo se vería el mensaje con variables
-        preview = mensaje.format(
-            member=interaction.user,
-            guild=interaction.guild,
-            member_count=interaction.guild.member_count
-        )
+        preview = render_template(mensaje, interaction.user)
         
         embed = discord.Embed(
             title="✅ Mensaje de bienvenida actualizado",
@@ -238,24 +332,32 @@ class Welcome(commands.Cog):
         embed.add_field(name="Vista previa", value=preview, inline=False)
         embed.add_field(
             name="Variables disponibles", 
-            value="`{member.mention}` - Menciona al usuario\n`{member.name}` - Nombre del usuario\n`{guild.name}` - Nombre del servidor\n`{member_count}` - Total de miembros",
+            value="`{member.mention}` - Menciona al usuario\n`{member.name}` - Nombre del usuario\n`{member.display_name}` - Apodo del usuario\n`{member.id}` - ID del usuario\n`{guild.name}` - Nombre del servidor\n`{guild.id}` - ID del servidor\n`{member_count}` - Total de miembros",
             inline=False
         )
         
+        # Validar que el mensaje tenga las variables necesarias
+        if "{member.mention}" not in mensaje:
+            embed.add_field(
+                name="⚠️ Recomendado",
+                value="Incluye `{member.mention}` en el mensaje para mencionar al usuario",
+                inline=False
+            )
+        
         await interaction.response.send_message(embed=embed)
     
     @app_commands.command(name="testwelcome", description="Prueba el mensaje de bienvenida")
     @app_commands.default_permissions(administrator=True)
     async def test_welcome(self, interaction: discord.Interaction):
         """Comando para probar la bienvenida"""
-        guild_id = str(interaction.guild.id)
+        guild_id = interaction.guild.id
         
-        if guild_id not in self.welcome_data:
+        if not self.get_welcome_config(guild_id):
             await interaction.response.send_message("❌ No hay configuración de bienvenidas para este servidor.", ephemeral=True)
             return
         
         # Simular el evento de bienvenida
-        config = self.welcome_data[guild_id]
+        config = self.get_welcome_config(guild_id)
         channel_id = config.get('channel_id')
         
         if not channel_id:
@@ -267,23 +369,8 @@ class Welcome(commands.Cog):
             await interaction.response.send_message("❌ El canal de bienvenidas no existe.", ephemeral=True)
             return
         
-        # Obtener el mensaje y tipo de bienvenida
-        message = config.get('message', '¡Bienvenido {member.mention} al servidor!')
-        welcome_type = config.get('type', 'embed')
-        
-        # Reemplazar variables en el mensaje
-        formatted_message = message.format(
-            member=interaction.user,
-            guild=interaction.guild,
-            member_count=interaction.guild.member_count
-        )
-        
         try:
-            if welcome_type == 'embed':
-                await self.send_embed_welcome(channel, interaction.user, formatted_message, config)
-            elif welcome_type == 'gif':
-                await self.send_gif_welcome(channel, interaction.user, formatted_message, config)
-            
+            await self.send_welcome(channel, interaction.user, config)
             await interaction.response.send_message("✅ Mensaje de bienvenida probado!", ephemeral=True)
             
         except Exception as e:
@@ -293,9 +380,9 @@ class Welcome(commands.Cog):
     @app_commands.default_permissions(administrator=True)
     async def set_welcome_background(self, interaction: discord.Interaction, url: str = None):
         """Configura una imagen de fondo para las bienvenidas"""
-        guild_id = str(interaction.guild.id)
+        guild_id = interaction.guild.id
         
-        if guild_id not in self.welcome_data:
+        if not self.get_welcome_config(guild_id):
             await interaction.response.send_message("❌ Primero configura el canal de bienvenidas con `/setwelcome`", ephemeral=True)
             return
         
@@ -305,22 +392,20 @@ class Welcome(commands.Cog):
                 await interaction.response.send_message("❌ Por favor proporciona una URL válida (http:// o https://)", ephemeral=True)
                 return
             
-            self.welcome_data[guild_id]['background_image'] = url
-            self.save_welcome_data()
+            self.settings.set(guild_id, 'welcome', 'background_image', url)
             await interaction.response.send_message(f"✅ Imagen de fondo establecida!", ephemeral=True)
         else:
             # Eliminar la imagen de fondo si no se proporciona URL
-            self.welcome_data[guild_id].pop('background_image', None)
-            self.save_welcome_data()
+            self.settings.delete(guild_id, 'welcome', 'background_image')
             await interaction.response.send_message("✅ Imagen de fondo eliminada", ephemeral=True)
     
     @app_commands.command(name="welcomegif", description="Establece un GIF para las bienvenidas")
     @app_commands.default_permissions(administrator=True)
     async def set_welcome_gif(self, interaction: discord.Interaction, url: str = None):
         """Configura un GIF para las bienvenidas tipo GIF"""
-        guild_id = str(interaction.guild.id)
+        guild_id = interaction.guild.id
         
-        if guild_id not in self.welcome_data:
+        if not self.get_welcome_config(guild_id):
             await interaction.response.send_message("❌ Primero configura el canal de bienvenidas con `/setwelcome`", ephemeral=True)
             return
         
@@ -330,28 +415,27 @@ class Welcome(commands.Cog):
                 await interaction.response.send_message("❌ Por favor proporciona una URL válida (http:// o https://)", ephemeral=True)
                 return
             
-            self.welcome_data[guild_id]['gif_url'] = url
-            self.save_welcome_data()
+            self.settings.set(guild_id, 'welcome', 'gif_url', url)
             await interaction.response.send_message(f"✅ GIF de bienvenida establecido!", ephemeral=True)
         else:
             # Eliminar el GIF si no se proporciona URL
-            self.welcome_data[guild_id].pop('gif_url', None)
-            self.save_welcome_data()
+            self.settings.delete(guild_id, 'welcome', 'gif_url')
             await interaction.response.send_message("✅ GIF de bienvenida eliminado", ephemeral=True)
     
     @app_commands.command(name="welcomesettings", description="Configura qué información mostrar en las bienvenidas")
     @app_commands.default_permissions(administrator=True)
     async def welcome_settings(self, interaction: discord.Interaction, mostrar_fecha_ingreso: bool = True, mostrar_edad_cuenta: bool = True):
         """Configura qué información mostrar en las bienvenidas"""
-        guild_id = str(interaction.guild.id)
+        guild_id = interaction.guild.id
         
-        if guild_id not in self.welcome_data:
+        if not self.get_welcome_config(guild_id):
             await interaction.response.send_message("❌ Primero configura el canal de bienvenidas con `/setwelcome`", ephemeral=True)
             return
         
-        self.welcome_data[guild_id]['show_join_date'] = mostrar_fecha_ingreso
-        self.welcome_data[guild_id]['show_account_age'] = mostrar_edad_cuenta
-        self.save_welcome_data()
+        self.settings.update(guild_id, 'welcome', {
+            'show_join_date': mostrar_fecha_ingreso,
+            'show_account_age': mostrar_edad_cuenta
+        })
         
         embed = discord.Embed(
             title="✅ Configuración de bienvenidas actualizada",
@@ -366,13 +450,13 @@ class Welcome(commands.Cog):
     @app_commands.default_permissions(administrator=True)
     async def show_welcome_config(self, interaction: discord.Interaction):
         """Muestra la configuración actual de bienvenidas"""
-        guild_id = str(interaction.guild.id)
+        guild_id = interaction.guild.id
         
-        if guild_id not in self.welcome_data:
+        if not self.get_welcome_config(guild_id):
             await interaction.response.send_message("❌ No hay configuración de bienvenidas para este servidor.", ephemeral=True)
             return
         
-        config = self.welcome_data[guild_id]
+        config = self.get_welcome_config(guild_id)
         channel = self.bot.get_channel(config.get('channel_id'))
         
         embed = discord.Embed(
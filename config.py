@@ -10,7 +10,7 @@ GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
 if not BOT_TOKEN:
     raise ValueError("❌ No se encontró DISCORD_BOT_TOKEN en las variables de entorno")
 
-# Configuración de roles (usa tus IDs)
+# Configuración de roles por defecto (usa tus IDs); cada servidor puede cambiarlos con /auth
 ROLES = {
     "NORMAL": 1424194212064268410,  # Rol para comandos de utilidades/fun
     "ADMIN": 1424194293408727182,   # Rol para moderación, tickets, etc.
@@ -23,6 +23,92 @@ TICKET_COUNTER = 1  # NUEVO: Contador global de tickets
 # Configuración de seguridad
 MAX_JOINS_PER_MINUTE = 5
 MAX_MENTIONS_PER_MESSAGE = 5
+BOT_ADD_AUDIT_WAIT = 5           # Segundos máximos esperando la entrada de auditoría de un bot
+
+# Consultas de perfil completo (banner) para casos dudosos
+PROFILE_FETCH_BUDGET = 10        # Peticiones permitidas por servidor...
+PROFILE_FETCH_PERIOD = 60        # ...cada este número de segundos
+
+# Anti-nuke: (acciones, segundos) que puede hacer un mismo usuario antes de reaccionar
+ANTI_NUKE_THRESHOLDS = {
+    "channel_delete": (3, 10),
+    "role_delete": (3, 10),
+    "ban": (5, 10),
+    "kick": (5, 10),
+    "webhook_create": (3, 30),
+}
+ANTI_NUKE_RESPONSES = ["strip_roles", "quarantine", "alert"]  # Respuestas automáticas
+ANTI_NUKE_MAX_ACTORS = 256       # Máximo de usuarios rastreados por servidor
+QUARANTINE_ROLE_NAME = "🔒 Cuarentena"
+QUARANTINE_TIMEOUT_HOURS = 24
+
+# Verificación por captcha de cuentas sospechosas
+CAPTCHA_ENABLED = True
+CAPTCHA_ROLE_NAME = "⏳ Sin verificar"
+CAPTCHA_CHANNEL_NAME = "✅verificación"
+CAPTCHA_LENGTH = 6               # Caracteres de cada captcha
+CAPTCHA_POOL_SIZE = 500          # Captchas pre-renderizados listos para una ráfaga de joins
+CAPTCHA_ANSWER_TTL = 300         # Segundos para responder un captcha concreto
+CAPTCHA_MAX_ATTEMPTS = 3         # Fallos permitidos antes de expulsar
+CAPTCHA_TIMEOUT = 900            # Segundos para verificarse antes de la expulsión
+
+# Cambios de rol agrupados por miembro (reaction roles, verificación)
+ROLE_BATCH_DELAY = 1.0           # Segundos de espera tras el último cambio antes de aplicar
+ROLE_BATCH_MAX_DELAY = 3.0       # Espera máxima desde el primer cambio del lote
+
+# Reconciliación de reaction roles (reacciones hechas con el bot apagado)
+REACTION_ROLE_RECONCILE_ON_STARTUP = True
+REACTION_ROLE_RECONCILE_REMOVE = False   # Quitar el rol a quien no tiene la reacción (puede tenerlo por otra vía)
+REACTION_ROLE_RECONCILE_CONCURRENCY = 2  # Mensajes revisados a la vez por servidor
+
+# Oleadas de avatares idénticos (hash perceptual)
+AVATAR_CLUSTER_WINDOW = 600      # Segundos que se recuerdan los avatares de los joins
+AVATAR_CLUSTER_SIZE = 4          # Cuentas con el mismo avatar para considerarlo oleada
+AVATAR_HASH_DISTANCE = 6         # Bits de diferencia tolerados entre dHash de 64 bits
+
+# Oleadas de nombres similares (MinHash de n-gramas)
+NAME_CLUSTER_WINDOW = 300        # Segundos que se recuerdan los nombres de los joins
+NAME_CLUSTER_SIZE = 4            # Nombres similares para considerarlo oleada
+NAME_CLUSTER_SIMILARITY = 0.6    # Similitud de Jaccard estimada mínima
+
+# Slowmode automático según el ritmo de mensajes de cada canal
+AUTO_SLOWMODE_ENABLED = True
+AUTO_SLOWMODE_TAU = 20           # Constante de tiempo de la media móvil (segundos)
+AUTO_SLOWMODE_LEVELS = [         # (mensajes/segundo para entrar, segundos de slowmode)
+    (0.0, 0),
+    (1.5, 2),
+    (3.0, 5),
+    (6.0, 10),
+    (12.0, 30),
+]
+AUTO_SLOWMODE_HYSTERESIS = 0.5   # Bajar de nivel solo por debajo de esta fracción del umbral
+AUTO_SLOWMODE_COOLDOWN = 30      # Segundos mínimos entre ediciones del mismo canal
+
+# Logs de seguridad
+SECURITY_LOG_CHANNEL = "🔒security-logs"
+SECURITY_LOG_FLUSH_INTERVAL = 1.0   # Segundos entre lotes de hasta 10 embeds
+SECURITY_LOG_USE_WEBHOOK = True     # Enviar por webhook (cubeta de rate limit propia)
+
+# Detección de mensajes duplicados (raids de copiar/pegar)
+DUPLICATE_FLOOD_MESSAGES = 4     # Mensajes casi idénticos necesarios
+DUPLICATE_FLOOD_ACCOUNTS = 3     # Cuentas distintas que los envían
+DUPLICATE_FLOOD_WINDOW = 30      # Ventana en segundos
+DUPLICATE_MIN_LENGTH = 12        # Ignorar mensajes más cortos ("hola", "gg"...)
+
+# Enlaces de invitación a otros servidores
+INVITE_FILTER_ENABLED = True
+INVITE_ALLOWED_GUILDS = []       # IDs de servidores aliados cuyas invitaciones se permiten
+INVITE_CACHE_TTL = 3600          # Segundos que se recuerda a qué servidor lleva un código
+INVITE_NEGATIVE_TTL = 300        # Segundos que se recuerda un código inexistente
+
+# Escaneo de adjuntos contra un corpus local de hashes maliciosos
+ATTACHMENT_SCAN_ENABLED = True
+ATTACHMENT_KNOWN_BAD_FILE = "data/known_bad_attachments.json"  # {"sha256": {hash: etiqueta}, "phash": {hex: etiqueta}}
+ATTACHMENT_MAX_BYTES = 8 * 1024 * 1024        # Adjuntos más grandes no se descargan
+ATTACHMENT_IMAGE_MAX_BYTES = 4 * 1024 * 1024  # Límite para calcular el hash perceptual
+ATTACHMENT_SCAN_CONCURRENCY = 4               # Descargas simultáneas
+ATTACHMENT_PHASH_DISTANCE = 4                 # Bits de diferencia tolerados en el dHash
+ATTACHMENT_VERDICT_TTL = 3600                 # Segundos que se recuerda el veredicto de cada adjunto
 
 # Configuración de IA
 AI_ENABLED = bool(GEMINI_API_KEY)
@@ -3,6 +3,8 @@ from discord.ext import commands
 import config
 import asyncio
 import os
+from cogs.guildconfig import close_guild_config
+from cogs.imaging import close_image_pool
 
 class MyBot(commands.Bot):
     def __init__(self):
@@ -14,6 +16,24 @@ class MyBot(commands.Bot):
         )
         self.start_time = discord.utils.utcnow()
     
+    async def close(self):
+        # Aplicar los cambios de rol pendientes mientras la conexión sigue abierta
+        batcher = getattr(self, 'role_batcher', None)
+        if batcher:
+            await batcher.close()
+        
+        # Cerrar la sesión HTTP compartida de la caché de recursos (ver cogs/assetcache.py)
+        cache = getattr(self, 'asset_cache', None)
+        if cache:
+            await cache.close()
+        await super().close()
+        
+        # Detener el vigilante de la configuración por servidor y cerrar SQLite
+        close_guild_config()
+        
+        # Terminar los procesos del pool de imágenes (captchas, tarjetas, hashes)
+        close_image_pool()
+    
     async def setup_hook(self):
         valid_cogs = ['moderation', 'music', 'welcome', 'saying', 'reactionrole', 'embedcreator', 'security', 'tickets', 'utilities', 'debug', 'ai_assistant', 'authorization']
         